@@ -259,8 +259,8 @@ with tab4:
                 st.metric("Confidence", f"{parsed_log.confidence:.0%}")
             
             with st.expander("📋 Detected Fields"):
-                for name, values in list(parsed_log.fields.items())[:15]:
-                    st.text(f"• {name}: {', '.join(str(v) for v in list(set(values))[:3])}")
+                for name in list(parsed_log.fields)[:15]:
+                    st.text(f"• {name}: {', '.join(str(v) for v in parsed_log.sample_values(name))}")
             
             with st.expander("📄 Sample Events"):
                 for event in parsed_log.sample_events[:3]:
@@ -279,7 +279,11 @@ with tab4:
                         db_dir = os.path.join(base_dir, "data", "vector_db")
                         
                         try:
-                            vector_store = initialize_vector_store(knowledge_dir, db_dir)
+                            # Loading the embedding model and DB is slow, so keep the store across reruns
+                            vector_store = st.session_state.get("cim_vector_store")
+                            if vector_store is None or (str(vector_store.knowledge_dir), str(vector_store.db_dir)) != (knowledge_dir, db_dir):
+                                vector_store = initialize_vector_store(knowledge_dir, db_dir)
+                                st.session_state.cim_vector_store = vector_store
                             if vector_store.available:
                                 stats = vector_store.get_stats()
                                 st.info(f"📚 Loaded {stats['total_fields']} CIM fields")
@@ -290,7 +294,13 @@ with tab4:
                     if vector_store:
                         with st.spinner("Generating CIM mappings..."):
                             try:
-                                mapping_chain = create_mapping_chain(vector_store, st.session_state.ai_client)
+                                # Reuse the chain across reruns so its query cache survives
+                                mapping_chain = st.session_state.get("cim_mapping_chain")
+                                if (mapping_chain is None
+                                        or mapping_chain.ai_client is not st.session_state.ai_client
+                                        or mapping_chain.vector_store is not vector_store):
+                                    mapping_chain = create_mapping_chain(vector_store, st.session_state.ai_client)
+                                    st.session_state.cim_mapping_chain = mapping_chain
                                 
                                 # Read vendor doc if available
                                 vendor_doc_content = None
@@ -311,22 +321,33 @@ with tab4:
                                     except Exception as e:
                                         st.warning(f"Could not read vendor doc: {e}")
 
-                                result = mapping_chain.analyze(parsed_log, vendor_docs=vendor_doc_content)
+                                # Stream so the detected data model shows up before the full table is generated
+                                summary_placeholder = st.empty()
+                                result = None
+                                for update in mapping_chain.analyze_stream(parsed_log, vendor_docs=vendor_doc_content):
+                                    if isinstance(update, dict):
+                                        summary_placeholder.info(
+                                            f"🧭 Detected {update['data_model']} > {update['dataset']} "
+                                            f"({update['confidence']:.0%} confidence), generating field mappings..."
+                                        )
+                                    else:
+                                        result = update
+                                summary_placeholder.empty()
                                 
-                                if result['success']:
+                                if result.success:
                                     st.success("✅ CIM Mapping Generated!")
                                     
                                     col1, col2, col3 = st.columns(3)
                                     with col1:
-                                        st.metric("Data Model", result.get('data_model', 'Unknown'))
+                                        st.metric("Data Model", result.data_model or 'Unknown')
                                     with col2:
-                                        st.metric("Dataset", result.get('dataset', 'Unknown'))
+                                        st.metric("Dataset", result.dataset or 'Unknown')
                                     with col3:
-                                        st.metric("Confidence", f"{result.get('confidence', 0):.0%}")
+                                        st.metric("Confidence", f"{result.confidence:.0%}")
                                     
                                     # Generate outputs
                                     output_gen = OutputGenerator(selected_mode)
-                                    outputs = output_gen.generate_output(result, sourcetype_name)
+                                    outputs = output_gen.generate_output(result.as_dict(), sourcetype_name)
                                     
                                     if 'gui_instructions' in outputs:
                                         with st.expander("🖥️ GUI Instructions", expanded=True):
@@ -344,9 +365,9 @@ with tab4:
                                         st.markdown(outputs['validation_spl'])
                                     
                                     with st.expander("🔍 Raw AI Output"):
-                                        st.markdown(result['mapping'])
+                                        st.markdown(result.mapping)
                                 else:
-                                    st.error(f"Mapping failed: {result.get('error')}")
+                                    st.error(f"Mapping failed: {result.error}")
                             except Exception as e:
                                 st.error(f"Error: {e}")
         else:
@@ -0,0 +1,114 @@
+"""
+Tests for the CIM mapping chain
+Run from the repository root with: python -m unittest
+"""
+import json
+import tempfile
+import unittest
+
+from utils.cim.llm_chain import _INHERITED_FIELDS, CIMMappingChain
+from utils.cim.log_parser import LogParser
+from utils.cim.vector_store import CIMVectorStore
+
+
+class RecordingClient:
+    """AI client stand-in that records each request and returns a fixed mapping."""
+
+    def __init__(self, response="Confidence: 80%\nData Model: Network_Traffic\nDataset: All_Traffic\n"):
+        self.response = response
+        self.questions = []
+
+    def get_response(self, question, kb_content, source_name, chat_history=None):
+        self.questions.append(question)
+        return {"success": True, "response": self.response, "message": "ok"}
+
+
+class ChainTestCase(unittest.TestCase):
+    """Builds a chain over a vector store in a throwaway directory."""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.vector_store = CIMVectorStore(knowledge_dir=self._tmp.name, db_dir=self._tmp.name)
+        self.chain = CIMMappingChain(self.vector_store)
+        self.parser = LogParser()
+
+
+class RepairMappingTests(ChainTestCase):
+    """_repair_mapping swaps sample values the LLM put in the Raw Field column back to field names."""
+
+    def test_values_from_the_first_sample_events_are_repaired(self):
+        lines = "\n".join(f"src=10.0.0.{i} dest=192.168.0.{i} user=user{i}" for i in range(1, 101))
+        parsed = self.parser.parse_file(lines.encode())
+
+        self.assertIn("src=10.0.0.1 ", parsed.sample_events[0])
+        self.assertEqual(parsed.sample_values('src'), ['10.0.0.1', '10.0.0.2', '10.0.0.3'])
+
+        repaired, notes = self.chain._repair_mapping("| 10.0.0.1 | src | alias |\n", parsed)
+
+        self.assertEqual(repaired, "| src | src | alias |\n")
+        self.assertEqual(notes, ["Repaired: '10.0.0.1' -> 'src'"])
+
+
+class NoMappableFieldsTests(ChainTestCase):
+    """Logs carrying only Splunk's inherited default fields never reach the LLM."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = RecordingClient()
+        self.chain.ai_client = self.client
+
+    def _parse(self, event):
+        return self.parser.parse_file(json.dumps(event).encode())
+
+    def test_inherited_field_set(self):
+        self.assertEqual(_INHERITED_FIELDS, {'_time', 'host', 'source', 'sourcetype', 'index', 'linecount'})
+
+    def test_each_inherited_field_is_skipped(self):
+        for field_name in sorted(_INHERITED_FIELDS):
+            with self.subTest(field=field_name):
+                result = self.chain.analyze(self._parse({field_name: "value"}))
+
+                self.assertTrue(result.success)
+                self.assertEqual(result.confidence, 0.0)
+                self.assertIn("No mappable fields detected", result.mapping)
+
+        self.assertEqual(self.client.questions, [])
+
+    def test_full_inherited_set_is_skipped_and_listed(self):
+        result = self.chain.analyze(self._parse({field_name: "value" for field_name in _INHERITED_FIELDS}))
+
+        self.assertEqual(self.client.questions, [])
+        listed = result.mapping.split("Inherited fields (", 1)[1].split(")", 1)[0]
+        self.assertEqual(set(listed.split(", ")), _INHERITED_FIELDS)
+
+    def test_one_mappable_field_reaches_the_llm(self):
+        event = {field_name: "value" for field_name in _INHERITED_FIELDS}
+        event["src"] = "10.0.0.1"
+
+        self.chain.analyze(self._parse(event))
+
+        self.assertEqual(len(self.client.questions), 1)
+
+
+class AnalyzeManyTests(ChainTestCase):
+    """analyze_many sends each distinct log once and shares the answer with its duplicates."""
+
+    def test_duplicate_logs_are_sent_once(self):
+        answer = "Confidence: 80%\nData Model: Network_Traffic\nDataset: All_Traffic\n"
+        client = RecordingClient(f"## LOG 1\n{answer}\n## LOG 2\n{answer}")
+        self.chain.ai_client = client
+        first = self.parser.parse_file(b"src=10.0.0.1 dest=10.0.0.2")
+        second = self.parser.parse_file(b'{"user": "alice", "action": "login"}')
+        logs = [first, self.parser.parse_file(b"src=10.0.0.1 dest=10.0.0.2"), second, first]
+
+        results = self.chain.analyze_many(logs)
+
+        self.assertEqual(len(client.questions), 1)
+        self.assertNotIn("LOG 3", client.questions[0])
+        self.assertEqual([result.parsed_log for result in results], logs)
+        self.assertTrue(all(result.data_model == "Network_Traffic" for result in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+Tests for the log parser
+Run from the repository root with: python -m unittest
+"""
+import unittest
+
+from utils.cim.log_parser import LogFormat, LogParser
+
+
+class CSVParsingTests(unittest.TestCase):
+    """CSV rows are parsed one line at a time."""
+
+    def setUp(self):
+        self.parser = LogParser()
+
+    def test_unclosed_quote_does_not_absorb_following_rows(self):
+        parsed = self.parser.parse_file(b'a,b,c,d\n1,"2,3,4\n5,6,7,8\n')
+
+        self.assertEqual(parsed.format, LogFormat.CSV)
+        self.assertEqual(list(parsed.fields['a']), ['1', '5'])
+        self.assertEqual(list(parsed.fields['b']), ['2,3,4', '6'])
+        self.assertEqual(list(parsed.fields['c']), ['7'])
+        self.assertEqual(list(parsed.fields['d']), ['8'])
+
+    def test_oversized_field_falls_back_to_plain_split(self):
+        big = 'x' * 200_000
+        parsed = self.parser.parse_file(f'a,b,c,d\n1,{big},3,4\n5,6,7,8\n'.encode())
+
+        self.assertEqual(list(parsed.fields['a']), ['1', '5'])
+        self.assertEqual(list(parsed.fields['b']), [big, '6'])
+        self.assertEqual(list(parsed.fields['d']), ['4', '8'])
+
+
+class JSONParsingTests(unittest.TestCase):
+    """JSON lines parse the same whether or not orjson is installed."""
+
+    def setUp(self):
+        self.parser = LogParser()
+
+    def test_nan_value_is_parsed(self):
+        parsed = self.parser.parse_file(b'{"a": NaN, "b": 1}\n{"a": 2, "b": Infinity}\n')
+
+        self.assertEqual(parsed.format, LogFormat.JSON)
+        self.assertEqual(list(parsed.fields['a']), ['nan', '2'])
+        self.assertEqual(list(parsed.fields['b']), ['1', 'inf'])
+
+    def test_integer_beyond_64_bits_keeps_its_digits(self):
+        parsed = self.parser.parse_file(b'{"id": 123456789012345678901234567890}\n')
+
+        self.assertEqual(list(parsed.fields['id']), ['123456789012345678901234567890'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,8 +4,10 @@ Supports Claude (paid), Groq (free), and HuggingFace (free) for chat functionali
 """
 
 import os
+import json
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 
 # ============================================
 # Abstract Base Class for AI Clients
@@ -70,6 +72,34 @@ The following is the official KB documentation for this log source. Base your an
         """Get a response from the AI for the user's question."""
         pass
     
+    def stream_response(self, question: str, kb_content: str, source_name: str,
+                        chat_history: Optional[List[Dict]] = None) -> Iterator[str]:
+        """
+        Yield the response text in chunks as it is generated.
+        
+        Providers without a streaming API yield the whole response as one chunk.
+        Raises RuntimeError with the provider's message if the request fails.
+        """
+        response = self.get_response(question, kb_content, source_name, chat_history)
+        if not response["success"]:
+            raise RuntimeError(response["message"])
+        yield response["response"]
+    
+    def _build_chat_messages(self, system_prompt: str, question: str,
+                             chat_history: Optional[List[Dict]] = None) -> List[Dict]:
+        """Build an OpenAI-style message list with the system prompt first."""
+        messages = [{"role": "system", "content": system_prompt}]
+        if chat_history:
+            for msg in chat_history:
+                messages.append({"role": msg["role"], "content": msg["content"]})
+        messages.append({"role": "user", "content": question})
+        return messages
+    
+    async def aget_response(self, question: str, kb_content: str, source_name: str,
+                            chat_history: Optional[List[Dict]] = None) -> Dict:
+        """Async variant of get_response; the blocking HTTP call runs in a worker thread."""
+        return await asyncio.to_thread(self.get_response, question, kb_content, source_name, chat_history)
+    
     @abstractmethod
     def get_provider_name(self) -> str:
         """Return the name of the AI provider."""
@@ -98,18 +128,17 @@ class ClaudeClient(BaseAIClient):
     def _format_chat_history(self, history: List[Dict]) -> List[Dict]:
         return [{"role": msg["role"], "content": msg["content"]} for msg in history]
     
+    def _build_messages(self, question: str, chat_history: Optional[List[Dict]] = None) -> List[Dict]:
+        """Build the message list; Claude takes the system prompt as a separate argument."""
+        return self._format_chat_history(chat_history or []) + [{"role": "user", "content": question}]
+    
     def get_response(self, question: str, kb_content: str, source_name: str,
                      chat_history: Optional[List[Dict]] = None) -> Dict:
         try:
             import anthropic
             
             system_prompt = self._build_system_prompt(source_name, kb_content)
-            messages = []
-            
-            if chat_history:
-                messages.extend(self._format_chat_history(chat_history))
-            
-            messages.append({"role": "user", "content": question})
+            messages = self._build_messages(question, chat_history)
             
             response = self.client.messages.create(
                 model=self.model,
@@ -132,6 +161,29 @@ class ClaudeClient(BaseAIClient):
             return {"success": False, "response": "", "message": "Failed to connect to Claude API."}
         except Exception as e:
             return {"success": False, "response": "", "message": f"Error: {str(e)}"}
+    
+    def stream_response(self, question: str, kb_content: str, source_name: str,
+                        chat_history: Optional[List[Dict]] = None) -> Iterator[str]:
+        import anthropic
+        
+        system_prompt = self._build_system_prompt(source_name, kb_content)
+        messages = self._build_messages(question, chat_history)
+        
+        try:
+            with self.client.messages.stream(
+                model=self.model,
+                max_tokens=2048,
+                system=system_prompt,
+                messages=messages
+            ) as stream:
+                for text in stream.text_stream:
+                    yield text
+        except anthropic.AuthenticationError:
+            raise RuntimeError("Authentication failed. Please check your API key.")
+        except anthropic.RateLimitError:
+            raise RuntimeError("Rate limit exceeded. Please wait and try again.")
+        except anthropic.APIConnectionError:
+            raise RuntimeError("Failed to connect to Claude API.")
 
 
 # ============================================
@@ -159,13 +211,7 @@ class GroqClient(BaseAIClient):
             
             system_prompt = self._build_system_prompt(source_name, kb_content)
             
-            messages = [{"role": "system", "content": system_prompt}]
-            
-            if chat_history:
-                for msg in chat_history:
-                    messages.append({"role": msg["role"], "content": msg["content"]})
-            
-            messages.append({"role": "user", "content": question})
+            messages = self._build_chat_messages(system_prompt, question, chat_history)
             
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
@@ -204,6 +250,49 @@ class GroqClient(BaseAIClient):
             return {"success": False, "response": "", "message": "Request timed out. Please try again."}
         except Exception as e:
             return {"success": False, "response": "", "message": f"Error: {str(e)}"}
+    
+    def stream_response(self, question: str, kb_content: str, source_name: str,
+                        chat_history: Optional[List[Dict]] = None) -> Iterator[str]:
+        import requests
+        
+        system_prompt = self._build_system_prompt(source_name, kb_content)
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "model": self.model,
+            "messages": self._build_chat_messages(system_prompt, question, chat_history),
+            "max_tokens": 2048,
+            "temperature": 0.7,
+            "stream": True
+        }
+        
+        try:
+            with requests.post(self.base_url, headers=headers, json=payload, timeout=60, stream=True) as response:
+                if response.status_code == 401:
+                    raise RuntimeError("Invalid Groq API key.")
+                elif response.status_code == 429:
+                    raise RuntimeError("Rate limit exceeded. Groq free tier has limits.")
+                elif response.status_code != 200:
+                    raise RuntimeError(f"Groq API error: {response.status_code}")
+                
+                # Server-sent events: "data: {json}" lines, terminated by "data: [DONE]"
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data: "):
+                        continue
+                    data = line[len("data: "):]
+                    if data == "[DONE]":
+                        break
+                    # Usage and keep-alive frames can arrive with an empty choices list
+                    delta = (json.loads(data).get("choices") or [{}])[0].get("delta", {})
+                    content = delta.get("content")
+                    if content:
+                        yield content
+        except requests.exceptions.Timeout:
+            raise RuntimeError("Request timed out. Please try again.")
 
 
 # ============================================
@@ -325,13 +414,7 @@ class OllamaClient(BaseAIClient):
             
             system_prompt = self._build_system_prompt(source_name, kb_content)
             
-            messages = [{"role": "system", "content": system_prompt}]
-            
-            if chat_history:
-                for msg in chat_history:
-                    messages.append({"role": msg["role"], "content": msg["content"]})
-            
-            messages.append({"role": "user", "content": question})
+            messages = self._build_chat_messages(system_prompt, question, chat_history)
             
             payload = {
                 "model": self.model,
@@ -359,6 +442,36 @@ class OllamaClient(BaseAIClient):
             return {"success": False, "response": "", "message": "Cannot connect to Ollama. Is it running locally?"}
         except Exception as e:
             return {"success": False, "response": "", "message": f"Error: {str(e)}"}
+    
+    def stream_response(self, question: str, kb_content: str, source_name: str,
+                        chat_history: Optional[List[Dict]] = None) -> Iterator[str]:
+        import requests
+        
+        system_prompt = self._build_system_prompt(source_name, kb_content)
+        
+        payload = {
+            "model": self.model,
+            "messages": self._build_chat_messages(system_prompt, question, chat_history),
+            "stream": True
+        }
+        
+        try:
+            with requests.post(f"{self.base_url}/api/chat", json=payload, timeout=120, stream=True) as response:
+                if response.status_code != 200:
+                    raise RuntimeError(f"Ollama error: {response.status_code}")
+                
+                # One JSON object per line until "done" is true
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    content = data.get("message", {}).get("content")
+                    if content:
+                        yield content
+                    if data.get("done"):
+                        break
+        except requests.exceptions.ConnectionError:
+            raise RuntimeError("Cannot connect to Ollama. Is it running locally?")
 
 
 # ============================================
@@ -3,12 +3,12 @@ CIM Mapping Tool Modules
 """
 from utils.cim.log_parser import LogParser, ParsedLog, LogFormat
 from utils.cim.vector_store import CIMVectorStore, initialize_vector_store
-from utils.cim.llm_chain import CIMMappingChain, create_mapping_chain
+from utils.cim.llm_chain import CIMMappingChain, AnalysisResult, create_mapping_chain
 from utils.cim.output_generator import OutputGenerator, FieldMapping
 
 __all__ = [
     'LogParser', 'ParsedLog', 'LogFormat',
     'CIMVectorStore', 'initialize_vector_store',
-    'CIMMappingChain', 'create_mapping_chain',
+    'CIMMappingChain', 'AnalysisResult', 'create_mapping_chain',
     'OutputGenerator', 'FieldMapping'
 ]
@@ -2,13 +2,53 @@
 LLM-based CIM Mapping Chain
 Uses the shared AI client from the main app
 """
+import io
 import re
+import logging
 import json
-import re
-import json
-from typing import Dict, List, Optional, Tuple
+import string
+import hashlib
+import asyncio
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
 from utils.cim.log_parser import ParsedLog
 from utils.cim.vector_store import CIMVectorStore
+from utils.cim.query_cache import QueryCache
+
+
+logger = logging.getLogger(__name__)
+
+# Splunk default fields that CIM inherits and that never need a mapping
+_INHERITED_FIELDS = frozenset({'_time', 'host', 'source', 'sourcetype', 'index', 'linecount'})
+
+# Patterns for pulling the summary headers out of the LLM response
+_RE_SUMMARY = re.compile(
+    r'Confidence:\s*(?P<conf>\d+)%|Data Model:\s*(?P<dm>.+)|Dataset:\s*(?P<ds>.+)'
+)
+# Markdown table row; group 1 is the content of the first cell (the raw field)
+_RE_ROW = re.compile(r'^\|\s*([^|]+?)\s*\|', re.MULTILINE)
+# Control characters stripped from sample events (tabs and newlines are kept)
+_RE_CONTROL_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+
+# Default cap on the characters of each sample event sent to the LLM
+_MAX_EVENT_CHARS = 2000
+
+# Header that starts each log's answer in a multi-log response
+_RE_LOG_BLOCK = re.compile(r'^#+\s*LOG\s+(\d+)\s*$', re.MULTILINE)
+
+# Display tag for each CIM field flag in the retrieved context
+_FLAG_DISPLAY = {
+    "calculated": "[FLAG: CALCULATED]",
+    "extracted": "[FLAG: EXTRACTED]",
+    "inherited": "[FLAG: INHERITED]"
+}
+
+# How the LLM should map a field with the given flag
+_MAPPING_HINT = {
+    "calculated": " → MUST use EVAL",
+    "extracted": " → use FIELDALIAS",
+    "inherited": " → DO NOT MAP"
+}
 
 
 # System prompt for CIM mapping
@@ -30,7 +70,7 @@ CRITICAL INSTRUCTION: You MUST check the '[FLAG: ...]' for each CIM field in the
    - EXAMPLE: | raw_field | cim_field | Alias | extracted | Required | Direct mapping |
 
 3. [FLAG: INHERITED]
-   - DO NOT MAP these fields (host, source, sourcetype, _time)
+   - DO NOT MAP these fields (_time, host, source, sourcetype, index, linecount)
 
 == CORRECT ROW EXAMPLE ==
 | action_id | action | Eval  | calculated | Required | case(action_id=1, "success", action_id=0, "failure") |
@@ -44,29 +84,8 @@ NEVER use a sample value (like an IP address "192.168.1.1" or timestamp) as a fi
 Structure your output so that the Raw Field is always the NAME of the field.
 """
 
-CIM_MAPPING_USER_PROMPT = """Analyze the following log data and provide CIM mappings.
-
-LOG FORMAT: {log_format}
-VENDOR: {vendor}
-PRODUCT: {product}
-CONFIDENCE: {format_confidence}
-
-DETECTED FIELDS (These are the ONLY valid Raw Field names you can use):
-{field_list}
-
-VENDOR DOCUMENTATION:
-{vendor_docs}
-(Note: This documentation might contain unrelated text. FOCUS ONLY on log field definitions, schema details, and example events.)
-
-SAMPLE LOG EVENTS:
-{sample_events}
-
-RELEVANT CIM KNOWLEDGE:
-{cim_context}
-
-Provide your analysis in this EXACT format:
-
-## Data Model: [Primary CIM Data Model Name]
+# Response layout shared by the single-log and multi-log prompts
+CIM_MAPPING_RESPONSE_FORMAT = """## Data Model: [Primary CIM Data Model Name]
 ## Dataset: [Specific Dataset Name]
 ## Confidence: [0-100]%
 ## Reasoning: [Why this data model was chosen]
@@ -103,189 +122,697 @@ index=* sourcetype=your_sourcetype
 - List any fields you couldn't map with high confidence
 """
 
+CIM_MAPPING_USER_PROMPT = """Analyze the following log data and provide CIM mappings.
+
+LOG FORMAT: {log_format}
+VENDOR: {vendor}
+PRODUCT: {product}
+CONFIDENCE: {format_confidence}
+
+DETECTED FIELDS (These are the ONLY valid Raw Field names you can use):
+{field_list}
+
+VENDOR DOCUMENTATION:
+{vendor_docs}
+(Note: This documentation might contain unrelated text. FOCUS ONLY on log field definitions, schema details, and example events.)
+
+SAMPLE LOG EVENTS:
+{sample_events}
+
+RELEVANT CIM KNOWLEDGE:
+{cim_context}
+
+Provide your analysis in this EXACT format:
+
+""" + CIM_MAPPING_RESPONSE_FORMAT
+
+CIM_MAPPING_MULTI_LOG_PROMPT = """Analyze each of the following {log_count} log sources and provide CIM mappings for every one of them.
+
+{log_sections}
+
+VENDOR DOCUMENTATION:
+{vendor_docs}
+(Note: This documentation might contain unrelated text. FOCUS ONLY on log field definitions, schema details, and example events.)
+
+RELEVANT CIM KNOWLEDGE:
+{cim_context}
+
+Answer for every log in order. Start each answer with its own header line "## LOG <number>" (for example "## LOG 1"), followed by the analysis for that log in this EXACT format:
+
+""" + CIM_MAPPING_RESPONSE_FORMAT
+
+CIM_MAPPING_LOG_SECTION = """=== LOG {index} ===
+LOG FORMAT: {log_format}
+VENDOR: {vendor}
+PRODUCT: {product}
+CONFIDENCE: {format_confidence}
+
+DETECTED FIELDS (These are the ONLY valid Raw Field names you can use for LOG {index}):
+{field_list}
+
+SAMPLE LOG EVENTS:
+{sample_events}
+"""
+
+# Reference block placed ahead of the retrieved CIM fields
+_CIM_CONTEXT_HEADER = """
+=== FIELD FLAG REFERENCE (VITAL) ===
+- [FLAG: CALCULATED] -> MUST be 'Eval' -> MUST be 'calculated'
+- [FLAG: EXTRACTED]  -> MUST be 'Alias' -> MUST be 'extracted'
+- [FLAG: INHERITED]  -> DO NOT MAP
+====================================
+"""
+
+
+def _parse_template(template: str) -> List[Tuple[str, Optional[str]]]:
+    """Split a prompt template into (literal text, placeholder name) pairs once at import."""
+    return [(literal, field_name) for literal, field_name, _, _ in string.Formatter().parse(template)]
+
+
+def _render_prompt(parts: List[Tuple[str, Optional[str]]], **values) -> str:
+    """Fill a pre-parsed template; placeholders are plain names without format specs."""
+    out = []
+    for literal, field_name in parts:
+        out.append(literal)
+        if field_name is not None:
+            out.append(str(values[field_name]))
+    return "".join(out)
+
+
+def _bind_template(parts: List[Tuple[str, Optional[str]]], **values) -> List[Tuple[str, Optional[str]]]:
+    """Fill some placeholders of a pre-parsed template, merging them into the literal text."""
+    bound = []
+    for literal, field_name in parts:
+        if field_name in values:
+            literal, field_name = literal + str(values[field_name]), None
+        if bound and bound[-1][1] is None:
+            bound[-1] = (bound[-1][0] + literal, field_name)
+        else:
+            bound.append((literal, field_name))
+    return bound
+
+
+_USER_PROMPT_PARTS = _parse_template(CIM_MAPPING_USER_PROMPT)
+_MULTI_LOG_PROMPT_PARTS = _parse_template(CIM_MAPPING_MULTI_LOG_PROMPT)
+_LOG_SECTION_PARTS = _parse_template(CIM_MAPPING_LOG_SECTION)
+
+
+@dataclass(slots=True)
+class AnalysisResult:
+    """Outcome of a single CIM mapping analysis."""
+    success: bool
+    mapping: Optional[str]
+    confidence: float
+    data_model: Optional[str]
+    dataset: Optional[str]
+    parsed_log: ParsedLog
+    error: Optional[str] = None
+    repair_notes: List[str] = field(default_factory=list)
+    
+    def as_dict(self) -> Dict:
+        """Convert to the plain result dict used by OutputGenerator and older callers."""
+        return {
+            "success": self.success,
+            "mapping": self.mapping,
+            "repair_notes": self.repair_notes,
+            "confidence": self.confidence,
+            "data_model": self.data_model,
+            "dataset": self.dataset,
+            "parsed_log": self.parsed_log,
+            "error": self.error
+        }
+
 
 class CIMMappingChain:
     """RAG chain for intelligent CIM field mapping using the shared AI client."""
     
-    def __init__(self, vector_store: CIMVectorStore, ai_client=None):
+    def __init__(self, vector_store: CIMVectorStore, ai_client=None,
+                 cache_size: int = 512, cache_ttl_seconds: float = 600,
+                 similarity_threshold: Optional[float] = 0.92,
+                 max_event_chars: int = _MAX_EVENT_CHARS):
         """
         Initialize the CIM mapping chain.
         
         Args:
             vector_store: Initialized CIM vector store
             ai_client: AI client from the main app (GroqClient, etc.)
+            cache_size: Maximum number of analysis results kept in the query cache
+            cache_ttl_seconds: Seconds a cached analysis result stays valid
+            similarity_threshold: Minimum cosine similarity for reusing a cached mapping of a
+                log with the same format, vendor and field names (None disables the semantic cache)
+            max_event_chars: Maximum characters of each sample event included in the prompt
         """
         self.vector_store = vector_store
         self.ai_client = ai_client
+        self.similarity_threshold = similarity_threshold
+        self.max_event_chars = max_event_chars
+        self._cache = QueryCache(max_size=cache_size, ttl_seconds=cache_ttl_seconds)
+        self._context_cache = QueryCache(max_size=256, ttl_seconds=cache_ttl_seconds)
+        self._prompt_cache = QueryCache(max_size=256, ttl_seconds=cache_ttl_seconds)
+        self._context_cache_ts = vector_store.last_upsert_ts
+    
+    def _cache_key(self, parsed_log: ParsedLog, vendor_docs: Optional[str]) -> str:
+        """Build the query cache key from the parsed log signature."""
+        signature = "\n".join([
+            repr(sorted(parsed_log.fields.keys())),
+            parsed_log.format.value,
+            parsed_log.vendor or "",
+            parsed_log.product or "",
+            "\n".join(parsed_log.sample_events[:3]),
+            vendor_docs[:2000] if vendor_docs else ""
+        ])
+        return hashlib.blake2b(signature.encode('utf-8'), digest_size=16).hexdigest()
     
-    def _get_cim_context(self, field_list: str) -> str:
-        """Retrieve relevant CIM documentation based on detected fields."""
+    def _semantic_query(self, parsed_log: ParsedLog) -> str:
+        """Build the text embedded for semantic cache lookups."""
+        return (
+            f"{parsed_log.format.value}|{parsed_log.vendor or ''}|{parsed_log.product or ''}|"
+            f"{sorted(parsed_log.fields.keys())}"
+        )
+    
+    def _get_cim_context(self, field_names: Tuple[str, ...]) -> str:
+        """Retrieve relevant CIM documentation, memoized on the sorted detected field names."""
         if not self.vector_store.available:
             return "CIM knowledge base not available. Providing general guidance."
         
-        results = self.vector_store.search_similar_fields(field_list, n_results=20)
+        self._refresh_context_caches()
+        
+        cim_context = self._context_cache.get(field_names)
+        if cim_context is None:
+            cim_context = self._compute_cim_context(field_names)
+            self._context_cache.set(field_names, cim_context)
+        return cim_context
+    
+    def clear_cache(self):
+        """Drop cached and stored mappings, CIM contexts and prompt skeletons (e.g. after rebuilding the vector store)."""
+        self.vector_store.clear_cache_collection()
+        self._cache.clear()
+        self._context_cache.clear()
+        self._prompt_cache.clear()
+        self._context_cache_ts = self.vector_store.last_upsert_ts
+    
+    def _refresh_context_caches(self):
+        """Drop memoized contexts and prompt skeletons if the CIM knowledge was reloaded."""
+        if self.vector_store.last_upsert_ts != self._context_cache_ts:
+            self._context_cache.clear()
+            self._prompt_cache.clear()
+            self._context_cache_ts = self.vector_store.last_upsert_ts
+    
+    def _compute_cim_context(self, field_names: Tuple[str, ...]) -> str:
+        """Build the CIM documentation context from a vector search over detected fields."""
+        # One short query per detected field name, embedded and searched in a single batched call
+        results = self.vector_store.search_similar_fields_ranked(list(field_names), n_results=3, limit=20)
         
         if not results:
             return "No relevant CIM documentation found."
         
-        context_parts = []
-        seen_models = set()
+        buf = io.StringIO()
+        seen_models: Set[Tuple[str, str]] = set()
         
         for result in results:
-            metadata = result['metadata']
-            data_model = metadata.get('data_model', '')
-            dataset = metadata.get('dataset', '')
-            field_name = metadata.get('field_name', '')
-            requirement = metadata.get('requirement', '')
-            prescribed_values = metadata.get('prescribed_values', '')
-            field_flag = metadata.get('field_flag', 'extracted')
+            g = result['metadata'].get
+            data_model = g('data_model', '')
+            dataset = g('dataset', '')
+            field_name = g('field_name', '')
+            requirement = g('requirement', '')
+            prescribed_values = g('prescribed_values', '')
+            field_flag = g('field_flag', 'extracted')
             
-            model_key = f"{data_model}_{dataset}"
+            model_key = (data_model, dataset)
             if model_key not in seen_models:
-                context_parts.append(f"\n### {data_model} > {dataset}")
-                context_parts.append(f"Tags: {metadata.get('tags', '')}")
+                buf.write(f"\n### {data_model} > {dataset}\nTags: {g('tags', '')}\n")
                 seen_models.add(model_key)
             
-            flag_display = f"[FLAG: {field_flag.upper()}]"
-            mapping_hint = ""
-            if field_flag == "calculated":
-                mapping_hint = " → MUST use EVAL"
-            elif field_flag == "extracted":
-                mapping_hint = " → use FIELDALIAS"
-            elif field_flag == "inherited":
-                mapping_hint = " → DO NOT MAP"
+            flag_display = _FLAG_DISPLAY.get(field_flag) or f"[FLAG: {field_flag.upper()}]"
+            mapping_hint = _MAPPING_HINT.get(field_flag, "")
             
-            field_info = f"- **{field_name}** {flag_display}{mapping_hint} ({requirement})"
+            buf.write(f"- **{field_name}** {flag_display}{mapping_hint} ({requirement})\n")
             if prescribed_values:
-                field_info += f"\n  Prescribed values: {prescribed_values}"
+                buf.write(f"  Prescribed values: {prescribed_values}\n")
+        
+        return _CIM_CONTEXT_HEADER + buf.getvalue()
+    
+    def analyze(self, parsed_log: ParsedLog, vendor_docs: Optional[str] = None) -> AnalysisResult:
+        """Analyze parsed log and generate CIM mappings."""
+        if not self.ai_client:
+            return self._error_result(
+                parsed_log, "No AI client configured. Please configure an AI provider in AI Setup tab."
+            )
+        
+        cached, cache_key, semantic_key = self._lookup_cache(parsed_log, vendor_docs)
+        if cached is not None:
+            return cached
+        
+        user_prompt, kb_content = self._build_prompt(parsed_log, vendor_docs)
+        
+        try:
+            # Use the shared AI client
+            response = self.ai_client.get_response(
+                question=user_prompt,
+                kb_content=kb_content,
+                source_name="CIM Mapping Assistant"
+            )
+            return self._handle_response(response, parsed_log, cache_key, semantic_key)
             
-            context_parts.append(field_info)
+        except Exception as e:
+            return self._error_result(parsed_log, str(e))
+    
+    async def analyze_async(self, parsed_log: ParsedLog, vendor_docs: Optional[str] = None) -> AnalysisResult:
+        """Async variant of analyze that awaits the AI client so several logs can overlap."""
+        if not self.ai_client:
+            return self._error_result(
+                parsed_log, "No AI client configured. Please configure an AI provider in AI Setup tab."
+            )
         
-        context_header = """
-=== FIELD FLAG REFERENCE (VITAL) ===
-- [FLAG: CALCULATED] -> MUST be 'Eval' -> MUST be 'calculated'
-- [FLAG: EXTRACTED]  -> MUST be 'Alias' -> MUST be 'extracted'
-- [FLAG: INHERITED]  -> DO NOT MAP
-====================================
-"""
+        # Cache lookups and context retrieval hit the local vector store, keep them off the loop
+        cached, cache_key, semantic_key = await asyncio.to_thread(
+            self._lookup_cache, parsed_log, vendor_docs
+        )
+        if cached is not None:
+            return cached
+        
+        user_prompt, kb_content = await asyncio.to_thread(self._build_prompt, parsed_log, vendor_docs)
         
-        return context_header + "\n".join(context_parts)
+        try:
+            aget_response = getattr(self.ai_client, "aget_response", None)
+            if aget_response is not None:
+                response = await aget_response(
+                    question=user_prompt,
+                    kb_content=kb_content,
+                    source_name="CIM Mapping Assistant"
+                )
+            else:
+                response = await asyncio.to_thread(
+                    self.ai_client.get_response,
+                    question=user_prompt,
+                    kb_content=kb_content,
+                    source_name="CIM Mapping Assistant"
+                )
+            return await asyncio.to_thread(
+                self._handle_response, response, parsed_log, cache_key, semantic_key
+            )
+            
+        except Exception as e:
+            return self._error_result(parsed_log, str(e))
     
-    def analyze(self, parsed_log: ParsedLog, vendor_docs: Optional[str] = None) -> Dict:
-        """Analyze parsed log and generate CIM mappings."""
+    async def analyze_batch(self, parsed_logs: List[ParsedLog], vendor_docs: Optional[str] = None,
+                            concurrency: int = 8) -> List[AnalysisResult]:
+        """Analyze several parsed logs concurrently, at most `concurrency` LLM calls at a time."""
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def run(parsed_log: ParsedLog) -> AnalysisResult:
+            async with semaphore:
+                return await self.analyze_async(parsed_log, vendor_docs)
+        
+        # Logs with the same signature would race each other past the cache, so only the first one is sent
+        first_by_key: Dict[str, int] = {}
+        owners = []
+        for i, parsed_log in enumerate(parsed_logs):
+            owners.append(first_by_key.setdefault(self._cache_key(parsed_log, vendor_docs), i))
+        
+        unique = list(first_by_key.values())
+        unique_results = dict(zip(unique, await asyncio.gather(*(run(parsed_logs[i]) for i in unique))))
+        
+        return [
+            unique_results[owner] if owner == i else replace(unique_results[owner], parsed_log=parsed_logs[i])
+            for i, owner in enumerate(owners)
+        ]
+    
+    def analyze_stream(self, parsed_log: ParsedLog, vendor_docs: Optional[str] = None) -> Iterator[Union[Dict, AnalysisResult]]:
+        """
+        Analyze parsed log while streaming the LLM response.
+        
+        Yields a partial result ({"partial": True, "data_model", "dataset",
+        "confidence"}) as soon as the summary headers have streamed in, then the
+        same AnalysisResult analyze() would return.
+        """
         if not self.ai_client:
-            return {
-                "success": False,
-                "error": "No AI client configured. Please configure an AI provider in AI Setup tab.",
-                "mapping": None,
-                "confidence": 0.0,
-                "data_model": None,
-                "dataset": None,
-                "parsed_log": parsed_log
-            }
-        
-        # Format field list
-        field_list = "\n".join([
-            f"- Field Name: \"{field_name}\" | Samples: {json.dumps(list(set(values))[:3])}"
-            for field_name, values in list(parsed_log.fields.items())[:25]
-        ])
+            yield self._error_result(
+                parsed_log, "No AI client configured. Please configure an AI provider in AI Setup tab."
+            )
+            return
         
-        # Format sample events
-        sample_events = "\n\n".join([
-            f"Event {i+1}:\n{event}"
-            for i, event in enumerate(parsed_log.sample_events[:3])
-        ])
+        cached, cache_key, semantic_key = self._lookup_cache(parsed_log, vendor_docs)
+        if cached is not None:
+            yield cached
+            return
+        
+        user_prompt, kb_content = self._build_prompt(parsed_log, vendor_docs)
+        
+        try:
+            stream_response = getattr(self.ai_client, "stream_response", None)
+            if stream_response is None:
+                # Clients without streaming get the prompt that was already built, in one call
+                response = self.ai_client.get_response(
+                    question=user_prompt,
+                    kb_content=kb_content,
+                    source_name="CIM Mapping Assistant"
+                )
+                yield self._handle_response(response, parsed_log, cache_key, semantic_key)
+                return
+            
+            chunks = []
+            summary = None
+            for chunk in stream_response(
+                question=user_prompt,
+                kb_content=kb_content,
+                source_name="CIM Mapping Assistant"
+            ):
+                chunks.append(chunk)
+                if summary is not None or "\n" not in chunk:
+                    continue
+                
+                # Only look at complete lines so a header value is never cut mid-token
+                text = "".join(chunks)
+                conf, data_model, dataset = self._scan_summary(text[:text.rfind("\n")])
+                if conf is not None and data_model is not None and dataset is not None:
+                    summary = (float(conf) / 100, data_model, dataset)
+                    yield {
+                        "partial": True,
+                        "confidence": summary[0],
+                        "data_model": data_model,
+                        "dataset": dataset,
+                        "parsed_log": parsed_log
+                    }
+            
+            response = {"success": True, "response": "".join(chunks), "message": "Response generated successfully"}
+            yield self._handle_response(response, parsed_log, cache_key, semantic_key, summary)
+            
+        except Exception as e:
+            yield self._error_result(parsed_log, str(e))
+    
+    def _lookup_cache(self, parsed_log: ParsedLog,
+                      vendor_docs: Optional[str]) -> Tuple[Optional[AnalysisResult], str, Optional[Tuple[str, Any]]]:
+        """Check the shortcuts that avoid an LLM call; returns (hit, cache_key, semantic_key).
+        
+        semantic_key is the (text, embedding) pair used for the semantic lookup, or
+        None when the semantic cache does not apply.
+        """
+        cache_key = self._cache_key(parsed_log, vendor_docs)
+        
+        if not any(field_name not in _INHERITED_FIELDS for field_name in parsed_log.fields):
+            logger.debug("Skipping LLM call: no mappable fields in %s log", parsed_log.format.value)
+            return self._no_mappable_fields_result(parsed_log), cache_key, None
+        
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return replace(cached, parsed_log=parsed_log), cache_key, None
+        
+        # Vendor docs steer the mapping, so only reuse similar logs' mappings without them
+        use_semantic_cache = (
+            self.similarity_threshold is not None
+            and not vendor_docs
+            and self.vector_store.available
+        )
+        if not use_semantic_cache:
+            return None, cache_key, None
         
-        # Get CIM context
-        cim_context = self._get_cim_context(field_list)
+        # Embedded once here and reused for the write-back after a cache miss
+        semantic_text = self._semantic_query(parsed_log)
+        semantic_key = (semantic_text, self.vector_store.embed([semantic_text])[0])
+        semantic_hit = self.vector_store.search_cache(semantic_key[1], threshold=self.similarity_threshold)
+        # The semantic text holds the sorted field names, so requiring it to match means the
+        # cached mapping was made for exactly this field set; only sample events may differ
+        if semantic_hit and semantic_hit["query"] == semantic_text:
+            result = self._build_result(semantic_hit["result_text"], parsed_log)
+            # Guard against stored mappings naming raw fields this log doesn't have
+            if self._mapped_source_fields(result.mapping) <= parsed_log.fields.keys() | _INHERITED_FIELDS:
+                self._cache.set(cache_key, replace(result))
+                return result, cache_key, semantic_key
+            logger.debug("Ignoring semantic cache hit: mapped fields missing from %s log", parsed_log.format.value)
+        
+        return None, cache_key, semantic_key
+    
+    def _build_prompt(self, parsed_log: ParsedLog, vendor_docs: Optional[str]) -> Tuple[str, str]:
+        """Build the user prompt and KB content sent to the AI client."""
+        field_list = self._format_field_list(parsed_log)
+        sample_events = self._format_sample_events(parsed_log)
+        
+        # Logs of the same shape share the CIM context and header lines, so those
+        # are bound into the template once and only per-log sections are filled in
+        field_names = tuple(sorted(list(parsed_log.fields.keys())[:25]))
+        shape_key = (parsed_log.format.value, parsed_log.vendor, parsed_log.product, field_names)
+        self._refresh_context_caches()
+        prompt_parts = self._prompt_cache.get(shape_key)
+        if prompt_parts is None:
+            prompt_parts = _bind_template(
+                _USER_PROMPT_PARTS,
+                log_format=parsed_log.format.value,
+                vendor=parsed_log.vendor or "Unknown",
+                product=parsed_log.product or "Unknown",
+                cim_context=self._get_cim_context(field_names)
+            )
+            self._prompt_cache.set(shape_key, prompt_parts)
         
         # Build the prompt
-        user_prompt = CIM_MAPPING_USER_PROMPT.format(
-            log_format=parsed_log.format.value,
-            vendor=parsed_log.vendor or "Unknown",
-            product=parsed_log.product or "Unknown",
+        user_prompt = _render_prompt(
+            prompt_parts,
             format_confidence=f"{parsed_log.confidence:.0%}",
             field_list=field_list,
             sample_events=sample_events,
-            cim_context=cim_context,
             vendor_docs=vendor_docs[:2000] if vendor_docs else "No vendor documentation provided."
         )
         
-        # Build KB content for the AI client
-        kb_content = f"{CIM_MAPPING_SYSTEM_PROMPT}\n\n{cim_context}"
+        # The CIM context already travels in the user prompt, so the KB content is just the instructions
+        kb_content = CIM_MAPPING_SYSTEM_PROMPT
+        
+        return user_prompt, kb_content
+    
+    def _format_field_list(self, parsed_log: ParsedLog) -> str:
+        """Format the detected fields with a few sample values each."""
+        return "\n".join([
+            f"- Field Name: \"{field_name}\" | Samples: {json.dumps(parsed_log.sample_values(field_name, 3))}"
+            for field_name in list(parsed_log.fields)[:25]
+        ])
+    
+    def _format_sample_events(self, parsed_log: ParsedLog) -> str:
+        """Format the first sample events for the prompt, truncating oversized ones."""
+        events = []
+        for i, event in enumerate(parsed_log.sample_events[:3]):
+            event = _RE_CONTROL_CHARS.sub('', event)
+            if len(event) > self.max_event_chars:
+                event = event[:self.max_event_chars] + '... [truncated]'
+            events.append(f"Event {i+1}:\n{event}")
+        return "\n\n".join(events)
+    
+    def analyze_many(self, parsed_logs: List[ParsedLog], vendor_docs: Optional[str] = None,
+                     logs_per_request: int = 3) -> List[AnalysisResult]:
+        """
+        Analyze several parsed logs with one LLM request per group of logs.
+        
+        The system prompt, vendor docs and CIM context are sent once per group
+        instead of once per log. Logs with the same cache key are sent once.
+        Logs whose answer is missing from the combined response are retried
+        individually.
+        """
+        if not self.ai_client:
+            return [
+                self._error_result(
+                    parsed_log, "No AI client configured. Please configure an AI provider in AI Setup tab."
+                )
+                for parsed_log in parsed_logs
+            ]
+        
+        # Logs with the same signature share one answer, so only the first one is looked up or sent
+        first_by_key: Dict[str, int] = {}
+        owners = []
+        for i, parsed_log in enumerate(parsed_logs):
+            owners.append(first_by_key.setdefault(self._cache_key(parsed_log, vendor_docs), i))
+        
+        results: List[Optional[AnalysisResult]] = [None] * len(parsed_logs)
+        pending = []
+        for i in first_by_key.values():
+            cached, cache_key, semantic_key = self._lookup_cache(parsed_logs[i], vendor_docs)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append((i, cache_key, semantic_key))
+        
+        for start in range(0, len(pending), max(1, logs_per_request)):
+            group = pending[start:start + max(1, logs_per_request)]
+            if len(group) == 1:
+                results[group[0][0]] = self.analyze(parsed_logs[group[0][0]], vendor_docs)
+                continue
+            
+            for i, result in self._analyze_group(parsed_logs, group, vendor_docs):
+                results[i] = result
+        
+        return [
+            results[owner] if owner == i else replace(results[owner], parsed_log=parsed_logs[i])
+            for i, owner in enumerate(owners)
+        ]
+    
+    def _analyze_group(self, parsed_logs: List[ParsedLog], group: List[Tuple[int, str, Optional[Tuple[str, Any]]]],
+                       vendor_docs: Optional[str]) -> List[Tuple[int, AnalysisResult]]:
+        """Send one combined prompt for a group of logs and split the answer per log."""
+        log_sections = []
+        context_names = set()
+        for index, (i, _, _) in enumerate(group, start=1):
+            parsed_log = parsed_logs[i]
+            field_list = self._format_field_list(parsed_log)
+            log_sections.append(_render_prompt(
+                _LOG_SECTION_PARTS,
+                index=index,
+                log_format=parsed_log.format.value,
+                vendor=parsed_log.vendor or "Unknown",
+                product=parsed_log.product or "Unknown",
+                format_confidence=f"{parsed_log.confidence:.0%}",
+                field_list=field_list,
+                sample_events=self._format_sample_events(parsed_log)
+            ))
+            # Shared fields are only looked up once for the whole group
+            context_names.update(list(parsed_log.fields.keys())[:25])
+        
+        cim_context = self._get_cim_context(tuple(sorted(context_names)))
+        user_prompt = _render_prompt(
+            _MULTI_LOG_PROMPT_PARTS,
+            log_count=len(group),
+            log_sections="\n".join(log_sections),
+            cim_context=cim_context,
+            vendor_docs=vendor_docs[:2000] if vendor_docs else "No vendor documentation provided."
+        )
+        kb_content = CIM_MAPPING_SYSTEM_PROMPT
         
         try:
-            # Use the shared AI client
             response = self.ai_client.get_response(
                 question=user_prompt,
                 kb_content=kb_content,
                 source_name="CIM Mapping Assistant"
             )
-            
-            if response["success"]:
-                result_text = response["response"]
-                confidence = self._extract_confidence(result_text)
-                data_model = self._extract_data_model(result_text)
-                dataset = self._extract_dataset(result_text)
-                # Repair mapping (fix values -> keys)
-                repaired_mapping, repair_notes = self._repair_mapping(result_text, parsed_log)
-                
-                confidence = self._extract_confidence(repaired_mapping)
-                data_model = self._extract_data_model(repaired_mapping)
-                dataset = self._extract_dataset(repaired_mapping)
-                
-                return {
-                    "success": True,
-                    "mapping": repaired_mapping,
-                    "repair_notes": repair_notes,
-                    "confidence": confidence,
-                    "data_model": data_model,
-                    "dataset": dataset,
-                    "parsed_log": parsed_log
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": response["message"],
-                    "mapping": None,
-                    "confidence": 0.0,
-                    "data_model": None,
-                    "dataset": None,
-                    "parsed_log": parsed_log
-                }
-            
         except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "mapping": None,
-                "confidence": 0.0,
-                "data_model": None,
-                "dataset": None,
-                "parsed_log": parsed_log
-            }
+            return [(i, self._error_result(parsed_logs[i], str(e))) for i, _, _ in group]
+        
+        if not response["success"]:
+            return [(i, self._error_result(parsed_logs[i], response["message"])) for i, _, _ in group]
+        
+        blocks = {}
+        headers = list(_RE_LOG_BLOCK.finditer(response["response"]))
+        for n, header in enumerate(headers):
+            end = headers[n + 1].start() if n + 1 < len(headers) else len(response["response"])
+            blocks.setdefault(int(header.group(1)), response["response"][header.end():end].strip())
+        
+        group_results = []
+        for index, (i, cache_key, semantic_key) in enumerate(group, start=1):
+            block = blocks.get(index)
+            if not block:
+                group_results.append((i, self.analyze(parsed_logs[i], vendor_docs)))
+                continue
+            
+            try:
+                block_response = {"success": True, "response": block, "message": response["message"]}
+                group_results.append((i, self._handle_response(block_response, parsed_logs[i], cache_key, semantic_key)))
+            except Exception as e:
+                group_results.append((i, self._error_result(parsed_logs[i], str(e))))
+        
+        return group_results
     
-    def _extract_confidence(self, result: str) -> float:
-        """Extract confidence score from LLM response."""
-        match = re.search(r'Confidence:\s*(\d+)%', result)
-        if match:
-            return float(match.group(1)) / 100
-        return 0.5
+    def _handle_response(self, response: Dict, parsed_log: ParsedLog,
+                         cache_key: str, semantic_key: Optional[Tuple[str, Any]],
+                         summary: Optional[Tuple[float, str, str]] = None) -> AnalysisResult:
+        """Turn an AI client response into an analysis result and populate the caches."""
+        if not response["success"]:
+            return self._error_result(parsed_log, response["message"])
+        
+        result = self._build_result(response["response"], parsed_log, summary)
+        self._cache.set(cache_key, replace(result))
+        if semantic_key is not None:
+            semantic_text, semantic_embedding = semantic_key
+            self.vector_store.add_to_cache(
+                semantic_text, semantic_embedding, response["response"],
+                data_model=result.data_model, dataset=result.dataset
+            )
+        return result
     
-    def _extract_data_model(self, result: str) -> Optional[str]:
-        """Extract data model name from LLM response."""
-        match = re.search(r'Data Model:\s*(.+)', result)
-        if match:
-            return match.group(1).strip()
-        return None
+    def _no_mappable_fields_result(self, parsed_log: ParsedLog) -> AnalysisResult:
+        """Build the result for logs that only carry inherited fields (or none at all)."""
+        found = ", ".join(sorted(parsed_log.fields)) or "none"
+        return AnalysisResult(
+            success=True,
+            mapping=f"No mappable fields detected. Fields found: {found}. "
+                    f"Inherited fields ({', '.join(sorted(_INHERITED_FIELDS))}) are never mapped to CIM.",
+            confidence=0.0,
+            data_model=None,
+            dataset=None,
+            parsed_log=parsed_log
+        )
+    
+    def _error_result(self, parsed_log: ParsedLog, error: str) -> AnalysisResult:
+        """Build the result returned when no mapping could be generated."""
+        return AnalysisResult(
+            success=False,
+            mapping=None,
+            confidence=0.0,
+            data_model=None,
+            dataset=None,
+            parsed_log=parsed_log,
+            error=error
+        )
+    
+    def _build_result(self, result_text: str, parsed_log: ParsedLog,
+                      summary: Optional[Tuple[float, str, str]] = None) -> AnalysisResult:
+        """Repair the raw LLM output for this log and extract the mapping summary.
+        
+        summary is the (confidence, data model, dataset) already read while streaming;
+        repair only rewrites table rows, so the header lines it came from are unchanged.
+        """
+        # Repair mapping (fix values -> keys)
+        repaired_mapping, repair_notes = self._repair_mapping(result_text, parsed_log)
+        
+        if summary is None:
+            summary = self._extract_summary(repaired_mapping)
+        confidence, data_model, dataset = summary
+        
+        return AnalysisResult(
+            success=True,
+            mapping=repaired_mapping,
+            confidence=confidence,
+            data_model=data_model,
+            dataset=dataset,
+            parsed_log=parsed_log,
+            repair_notes=repair_notes
+        )
+    
+    def _extract_summary(self, result: str) -> Tuple[float, Optional[str], Optional[str]]:
+        """Extract confidence, data model and dataset from LLM response in one scan."""
+        conf, data_model, dataset = self._scan_summary(result)
+        confidence = float(conf) / 100 if conf is not None else 0.5
+        return confidence, data_model, dataset
+    
+    def _scan_summary(self, result: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """Find the raw confidence, data model and dataset header values, None where missing."""
+        conf = data_model = dataset = None
+        for match in _RE_SUMMARY.finditer(result):
+            if conf is None and match.group('conf') is not None:
+                conf = match.group('conf')
+            elif data_model is None and match.group('dm') is not None:
+                data_model = match.group('dm').strip()
+            elif dataset is None and match.group('ds') is not None:
+                dataset = match.group('ds').strip()
+            if conf is not None and data_model is not None and dataset is not None:
+                break
+        
+        return conf, data_model, dataset
+    
+    def _mapped_source_fields(self, mapping_text: str) -> Set[str]:
+        """Collect the raw field names from the rows of the mapping table."""
+        source_fields = set()
+        
+        header_idx = mapping_text.find('Raw Field')
+        header_end = mapping_text.find('\n', header_idx) if header_idx >= 0 else -1
+        if header_end < 0:
+            return source_fields
+        
+        # Rows follow the header line until the first line that is not part of the table
+        for line in mapping_text[header_end + 1:].splitlines():
+            match = _RE_ROW.match(line)
+            if not match:
+                break
+            raw_field = match.group(1).strip('`"\' ')
+            if raw_field and raw_field.strip('-: '):
+                source_fields.add(raw_field)
+        
+        return source_fields
     
-    def _extract_dataset(self, result: str) -> Optional[str]:
-        """Extract dataset name from LLM response."""
-        match = re.search(r'Dataset:\s*(.+)', result)
-        if match:
-            return match.group(1).strip()
-        return None
-
     def _repair_mapping(self, mapping_text: str, parsed_log: ParsedLog) -> Tuple[str, List[str]]:
         """
         Post-process the LLM output to fix common hallucinations.
@@ -297,27 +824,27 @@ class CIMMappingChain:
         # We handle string representations of values
         value_to_field = {}
         for field_name, values in parsed_log.fields.items():
-            for val in values:
-                # Normalization for matching (strip quotes, lowercase if reasonable, but standard string match is safest)
-                # We map the string representation of the value to the field name
-                v_str = str(val).strip('"').strip("'")
+            # Later fields used to overwrite earlier ones, so the last field seen for a value wins
+            for val in set(values):
+                # We map the string representation of the value (quotes stripped) to the field name
+                v_str = str(val).strip('"\'')
                 if len(v_str) > 1: # Avoid mapping single chars which might be risky
                     value_to_field[v_str] = field_name
+        known_fields = frozenset(parsed_log.fields)
         
-        # Regex to find table rows: | raw_val | cim_field | ...
+        # Find table rows: | raw_val | cim_field | ...
         # We capture the line and the first cell content
         def replace_row(match):
             full_line = match.group(0)
             raw_content = match.group(1).strip()
             
             # If the raw content is already a valid field name, do nothing
-            if raw_content in parsed_log.fields:
+            if raw_content in known_fields:
                 return full_line
             
             # If it's a known value, swap it
-            clean_raw = raw_content.strip('"').strip("'")
-            if clean_raw in value_to_field:
-                correct_field = value_to_field[clean_raw]
+            correct_field = value_to_field.get(raw_content.strip('"\''))
+            if correct_field is not None:
                 repair_notes.append(f"Repaired: '{raw_content}' -> '{correct_field}'")
                 # Rebuild the line with the correct field name
                 # We replace the first occurrence of the raw content in the line
@@ -325,14 +852,11 @@ class CIMMappingChain:
             
             return full_line
 
-        # Pattern matches a markdown table row starts with | 
-        # Group 1 is the content of the first cell
-        # We look for lines that look like field mappings
-        repaired_text = re.sub(r'^\|\s*([^|]+?)\s*\|', replace_row, mapping_text, flags=re.MULTILINE)
+        repaired_text = _RE_ROW.sub(replace_row, mapping_text)
         
         return repaired_text, repair_notes
 
 
-def create_mapping_chain(vector_store: CIMVectorStore, ai_client=None) -> CIMMappingChain:
+def create_mapping_chain(vector_store: CIMVectorStore, ai_client=None, **kwargs) -> CIMMappingChain:
     """Factory function to create a CIM mapping chain."""
-    return CIMMappingChain(vector_store, ai_client)
+    return CIMMappingChain(vector_store, ai_client, **kwargs)
@@ -2,12 +2,76 @@
 Log Format Detection and Field Extraction Module
 Supports: JSON, XML, Key-Value, Syslog, CEF, LEEF, CSV
 """
+import io
 import re
+import csv
 import json
-from typing import Dict, List, Tuple, Optional
+from collections import defaultdict
+from typing import DefaultDict, Dict, Iterable, Iterator, List, Tuple, Optional
 from dataclasses import dataclass
 from enum import Enum
 
+# orjson is optional; its decode errors subclass json.JSONDecodeError
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# orjson rejects NaN, Infinity and out-of-range floats and turns integers beyond 64 bits (19+ digits) into
+# floats; such lines go through json.loads so they parse the same with or without orjson
+_LONG_DIGITS_RE = re.compile(r'\d{19}')
+
+
+def _json_loads(text: str):
+    """Decode one JSON document, using orjson when it would decode it exactly like json."""
+    if not ORJSON_AVAILABLE or _LONG_DIGITS_RE.search(text):
+        return json.loads(text)
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        return json.loads(text)
+
+
+# Parsers sample the first 100 events, plus the header row for CSV
+_MAX_SAMPLE_LINES = 101
+
+
+class _SampleList(list):
+    """A field's sample values, keeping the first `cap` appended and ignoring the rest."""
+    __slots__ = ('cap',)
+    
+    def __init__(self, cap: int):
+        """Create an empty list that holds at most cap values."""
+        super().__init__()
+        self.cap = cap
+    
+    def append(self, value: str):
+        """Add a value unless the list already holds `cap` values."""
+        if len(self) < self.cap:
+            super().append(value)
+
+
+def _flatten_json(obj, fields: DefaultDict[str, _SampleList], prefix: str = ""):
+    """Flatten a decoded JSON object into dotted field names, walking it with an explicit stack."""
+    containers = (dict, list)
+    stack = [(obj, prefix)] if isinstance(obj, containers) else []
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        node, path = pop()
+        if type(node) is dict:
+            # Pushed in reverse so fields come out in document order
+            for key, value in reversed(node.items()):
+                push((value, f"{path}.{key}" if path else key))
+        elif type(node) is list:
+            # Scalars directly inside lists have no field name and are skipped
+            for item in reversed(node):
+                if isinstance(item, containers):
+                    push((item, path))
+        else:
+            fields[path].append(str(node))
+
 
 class LogFormat(Enum):
     """Supported log formats."""
@@ -25,33 +89,76 @@ class LogFormat(Enum):
 class ParsedLog:
     """Container for parsed log information."""
     format: LogFormat
-    fields: Dict[str, List[str]]
+    fields: Dict[str, Iterable[str]]
     sample_events: List[str]
     vendor: Optional[str] = None
     product: Optional[str] = None
     confidence: float = 0.0
+    
+    def sample_values(self, field_name: str, k: int = 3) -> List[str]:
+        """Return the first k distinct values of a field, stopping as soon as k have been seen."""
+        seen = set()
+        out = []
+        for value in self.fields.get(field_name, ()):
+            if value not in seen:
+                seen.add(value)
+                out.append(value)
+                if len(out) == k:
+                    break
+        return out
 
 
 class LogParser:
     """Intelligent log parser with format detection and field extraction."""
     
-    def __init__(self):
+    def __init__(self, sample_cap: int = 50):
+        """
+        Initialize the log parser.
+        
+        Args:
+            sample_cap: Maximum number of sample values kept per field (the earliest ones are kept,
+                matching the sample events shown to the LLM)
+        """
+        self.sample_cap = sample_cap
         self.cef_pattern = re.compile(
             r'CEF:(\d+)\|([^|]*)\|([^|]*)\|([^|]*)\|([^|]*)\|([^|]*)\|([^|]*)\|(.*)'
         )
         self.leef_pattern = re.compile(
             r'LEEF:(\d+\.\d+)\|([^|]*)\|([^|]*)\|([^|]*)\|(.*)'
         )
-        self.kv_pattern = re.compile(r'(\w+)=("[^"]*"|\'[^\']*\'|[^\s]+)')
+        # Quoted values are captured without their quotes: (key, double-quoted, single-quoted, bare)
+        self.kv_pattern = re.compile(r'(\w+)=(?:"([^"]*)"|\'([^\']*)\'|([^\s]+))')
+        self.syslog_pattern = re.compile(
+            r'^(?:<\d+>)?(\w{3}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2})\s+(\S+)\s+(\S+?):\s*(.*)'
+        )
+        self.syslog_detect = re.compile(r'^<\d+>|^\w{3}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2}')
+    
+    def _scan_kv(self, text: str) -> Iterator[Tuple[str, str]]:
+        """Yield (key, value) pairs from key=value text, with surrounding quotes stripped."""
+        for key, double_quoted, single_quoted, bare in self.kv_pattern.findall(text):
+            yield key, double_quoted or single_quoted or bare
+    
+    def _new_samples(self) -> _SampleList:
+        """Create the bounded container holding one field's sample values."""
+        return _SampleList(self.sample_cap)
+    
+    def _new_fields(self, *names: str) -> DefaultDict[str, _SampleList]:
+        """Create a field table, seeded with names, that adds a sample container for any new key."""
+        fields = defaultdict(self._new_samples)
+        fields.update((name, self._new_samples()) for name in names)
+        return fields
     
     def parse_file(self, file_content: bytes, filename: str = "") -> ParsedLog:
         """Parse log file and extract fields."""
-        try:
-            content = file_content.decode('utf-8', errors='ignore')
-        except Exception:
-            content = file_content.decode('latin-1', errors='ignore')
-        
-        lines = [line.strip() for line in content.split('\n') if line.strip()]
+        # Walk the raw bytes line by line so each line is decoded and stripped in a single pass,
+        # and stop once the parsers have all the lines they will look at
+        lines = []
+        for raw_line in io.BytesIO(file_content):
+            line = raw_line.decode('utf-8', errors='ignore').strip()
+            if line:
+                lines.append(line)
+                if len(lines) == _MAX_SAMPLE_LINES:
+                    break
         
         if not lines:
             return ParsedLog(
@@ -87,16 +194,17 @@ class LogParser:
     
     def _detect_format(self, lines: List[str], filename: str) -> Tuple[LogFormat, float]:
         """Detect log format with confidence score."""
+        # Lines are already stripped, so the first character decides the structured formats
         sample = lines[0] if lines else ""
+        first = sample[:1]
         
-        if sample.strip().startswith('{'):
+        if first == '{':
             try:
-                json.loads(sample)
+                _json_loads(sample)
                 return LogFormat.JSON, 0.95
-            except:
+            except (ValueError, RecursionError):
                 pass
-        
-        if sample.strip().startswith('<'):
+        elif first == '<':
             return LogFormat.XML, 0.9
         
         if 'CEF:' in sample:
@@ -105,30 +213,40 @@ class LogParser:
         if 'LEEF:' in sample:
             return LogFormat.LEEF, 0.95
         
-        if filename.endswith('.csv') or ',' in sample:
-            if sample.count(',') >= 3:
-                return LogFormat.CSV, 0.8
+        # A .csv name alone was never enough, so only the comma count matters
+        if sample.count(',') >= 3:
+            return LogFormat.CSV, 0.8
         
-        syslog_pattern = r'^<\d+>|^\w{3}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2}'
-        if re.match(syslog_pattern, sample):
+        if self.syslog_detect.match(sample):
             return LogFormat.SYSLOG, 0.85
         
-        kv_matches = self.kv_pattern.findall(sample)
-        if len(kv_matches) >= 3:
-            return LogFormat.KEY_VALUE, 0.7
+        # Only whether there are at least three pairs matters, so stop counting there
+        kv_count = 0
+        for _ in self.kv_pattern.finditer(sample):
+            kv_count += 1
+            if kv_count == 3:
+                return LogFormat.KEY_VALUE, 0.7
         
         return LogFormat.UNKNOWN, 0.3
     
-    def _parse_json(self, lines: List[str]) -> Tuple[Dict[str, List[str]], Optional[str], Optional[str]]:
+    def _parse_json(self, lines: List[str]) -> Tuple[Dict[str, Iterable[str]], Optional[str], Optional[str]]:
         """Parse JSON formatted logs."""
-        fields = {}
+        fields = self._new_fields()
         vendor = None
         product = None
         
         for line in lines[:100]:
+            # Lines are already stripped, so anything not opening an object can't be an event
+            if line[0] != '{':
+                continue
             try:
-                event = json.loads(line)
-                self._extract_fields_recursive(event, fields)
+                event = _json_loads(line)
+                if all(not isinstance(value, (dict, list)) for value in event.values()):
+                    # Flat events (the common case) skip the recursive walk
+                    for key, value in event.items():
+                        fields[key].append(str(value))
+                else:
+                    _flatten_json(event, fields)
                 
                 if not vendor:
                     vendor = event.get('vendor') or event.get('Vendor') or event.get('source_vendor')
@@ -138,19 +256,24 @@ class LogParser:
             except json.JSONDecodeError:
                 continue
         
-        return fields, vendor, product
+        return dict(fields), vendor, product
     
-    def _parse_cef(self, lines: List[str]) -> Tuple[Dict[str, List[str]], Optional[str], Optional[str]]:
+    def _parse_cef(self, lines: List[str]) -> Tuple[Dict[str, Iterable[str]], Optional[str], Optional[str]]:
         """Parse CEF (Common Event Format) logs."""
-        fields = {
-            'cef_version': [], 'device_vendor': [], 'device_product': [],
-            'device_version': [], 'signature_id': [], 'name': [], 'severity': []
-        }
+        fields = self._new_fields(
+            'cef_version', 'device_vendor', 'device_product',
+            'device_version', 'signature_id', 'name', 'severity'
+        )
         vendor = None
         product = None
         
         for line in lines[:100]:
-            match = self.cef_pattern.search(line)
+            # Jump straight to the header marker so the regex only verifies from there;
+            # a stray earlier "CEF:" falls back to searching the rest of the line
+            start = line.find('CEF:')
+            if start < 0:
+                continue
+            match = self.cef_pattern.match(line, start) or self.cef_pattern.search(line, start + 1)
             if match:
                 fields['cef_version'].append(match.group(1))
                 vendor = vendor or match.group(2)
@@ -163,22 +286,22 @@ class LogParser:
                 fields['severity'].append(match.group(7))
                 
                 extension = match.group(8)
-                ext_fields = self.kv_pattern.findall(extension)
-                for key, value in ext_fields:
-                    if key not in fields:
-                        fields[key] = []
-                    fields[key].append(value.strip('"\''))
+                for key, value in self._scan_kv(extension):
+                    fields[key].append(value)
         
-        return fields, vendor, product
+        return dict(fields), vendor, product
     
-    def _parse_leef(self, lines: List[str]) -> Tuple[Dict[str, List[str]], Optional[str], Optional[str]]:
+    def _parse_leef(self, lines: List[str]) -> Tuple[Dict[str, Iterable[str]], Optional[str], Optional[str]]:
         """Parse LEEF (Log Event Extended Format) logs."""
-        fields = {'leef_version': [], 'vendor': [], 'product': [], 'version': []}
+        fields = self._new_fields('leef_version', 'vendor', 'product', 'version')
         vendor = None
         product = None
         
         for line in lines[:100]:
-            match = self.leef_pattern.search(line)
+            start = line.find('LEEF:')
+            if start < 0:
+                continue
+            match = self.leef_pattern.match(line, start) or self.leef_pattern.search(line, start + 1)
             if match:
                 fields['leef_version'].append(match.group(1))
                 vendor = vendor or match.group(2)
@@ -188,42 +311,42 @@ class LogParser:
                 fields['version'].append(match.group(4))
                 
                 attributes = match.group(5)
-                attr_fields = self.kv_pattern.findall(attributes)
-                for key, value in attr_fields:
-                    if key not in fields:
-                        fields[key] = []
-                    fields[key].append(value.strip('"\''))
+                for key, value in self._scan_kv(attributes):
+                    fields[key].append(value)
         
-        return fields, vendor, product
+        return dict(fields), vendor, product
     
-    def _parse_csv(self, lines: List[str]) -> Tuple[Dict[str, List[str]], Optional[str], Optional[str]]:
+    def _parse_csv(self, lines: List[str]) -> Tuple[Dict[str, Iterable[str]], Optional[str], Optional[str]]:
         """Parse CSV formatted logs."""
-        fields = {}
-        
         if not lines:
-            return fields, None, None
+            return {}, None, None
         
-        headers = [h.strip() for h in lines[0].split(',')]
+        headers = [h.strip() for h in self._split_csv_line(lines[0])]
         
-        for header in headers:
-            fields[header] = []
+        fields = self._new_fields(*headers)
+        columns = [fields[header] for header in headers]
         
         for line in lines[1:101]:
-            values = [v.strip().strip('"') for v in line.split(',')]
-            for i, value in enumerate(values):
-                if i < len(headers):
-                    fields[headers[i]].append(value)
+            for column, value in zip(columns, self._split_csv_line(line)):
+                column.append(value.strip())
         
-        return fields, None, None
+        return dict(fields), None, None
+    
+    def _split_csv_line(self, line: str) -> List[str]:
+        """Split one CSV line, honouring quoted values (including embedded commas)."""
+        # Each line is read on its own so an unclosed quote can't swallow the rows after it
+        try:
+            return next(csv.reader([line], skipinitialspace=True), [])
+        except csv.Error:
+            # e.g. a field over the csv module's size limit; fall back to a plain split
+            return [value.strip().strip('"') for value in line.split(',')]
     
-    def _parse_syslog(self, lines: List[str]) -> Tuple[Dict[str, List[str]], Optional[str], Optional[str]]:
+    def _parse_syslog(self, lines: List[str]) -> Tuple[Dict[str, Iterable[str]], Optional[str], Optional[str]]:
         """Parse Syslog formatted logs."""
-        fields = {'timestamp': [], 'hostname': [], 'process': [], 'message': []}
-        
-        syslog_pattern = r'^(?:<\d+>)?(\w{3}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2})\s+(\S+)\s+(\S+?):\s*(.*)'
+        fields = self._new_fields('timestamp', 'hostname', 'process', 'message')
         
         for line in lines[:100]:
-            match = re.match(syslog_pattern, line)
+            match = self.syslog_pattern.match(line)
             if match:
                 fields['timestamp'].append(match.group(1))
                 fields['hostname'].append(match.group(2))
@@ -231,38 +354,17 @@ class LogParser:
                 message = match.group(4)
                 fields['message'].append(message)
                 
-                kv_matches = self.kv_pattern.findall(message)
-                for key, value in kv_matches:
-                    if key not in fields:
-                        fields[key] = []
-                    fields[key].append(value.strip('"\''))
+                for key, value in self._scan_kv(message):
+                    fields[key].append(value)
         
-        return fields, None, None
+        return dict(fields), None, None
     
-    def _parse_key_value(self, lines: List[str]) -> Tuple[Dict[str, List[str]], Optional[str], Optional[str]]:
+    def _parse_key_value(self, lines: List[str]) -> Tuple[Dict[str, Iterable[str]], Optional[str], Optional[str]]:
         """Parse key-value formatted logs."""
-        fields = {}
+        fields = self._new_fields()
         
         for line in lines[:100]:
-            matches = self.kv_pattern.findall(line)
-            for key, value in matches:
-                if key not in fields:
-                    fields[key] = []
-                fields[key].append(value.strip('"\''))
+            for key, value in self._scan_kv(line):
+                fields[key].append(value)
         
-        return fields, None, None
-    
-    def _extract_fields_recursive(self, obj, fields: Dict[str, List[str]], prefix: str = ""):
-        """Recursively extract fields from nested JSON objects."""
-        if isinstance(obj, dict):
-            for key, value in obj.items():
-                field_name = f"{prefix}.{key}" if prefix else key
-                if isinstance(value, (dict, list)):
-                    self._extract_fields_recursive(value, fields, field_name)
-                else:
-                    if field_name not in fields:
-                        fields[field_name] = []
-                    fields[field_name].append(str(value))
-        elif isinstance(obj, list):
-            for item in obj:
-                self._extract_fields_recursive(item, fields, prefix)
+        return dict(fields), None, None
@@ -2,12 +2,43 @@
 Output Generator for CIM Mappings
 Generates both GUI instructions (Splunk Cloud) and config files (Splunk Enterprise)
 """
+import os
 import re
-from typing import Dict, List
-from dataclasses import dataclass
+import string
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from dataclasses import dataclass, field
 
+# google-re2 is optional; its linear-time engine keeps the lazy .*? scans from backtracking
+try:
+    import re2
+    RE2_AVAILABLE = True
+except ImportError:
+    RE2_AVAILABLE = False
 
-@dataclass
+_re_engine = re2 if RE2_AVAILABLE else re
+
+# Patterns for the sections of the LLM mapping response
+_SECTIONS_RE = re.compile(r'Raw Field|## Required Tags:|## Calculated Fields')
+_SEPARATOR_CHARS = '-|' + string.whitespace
+_TAGS_RE = re.compile(r'## Required Tags:\s*\n((?:- .+\n?)+)')
+_CALC_BLOCK_RE = _re_engine.compile(r'(?s)## Calculated Fields.*?```\s*\n(.*?)```')
+
+# Lower-cases ASCII letters and turns spaces into underscores in a single translate pass
+_DM_TABLE = str.maketrans({**dict(zip(string.ascii_uppercase, string.ascii_lowercase)), ' ': '_'})
+
+
+def _dm_safe(data_model: str) -> str:
+    """Turn a data model name into the suffix used for eventtype names."""
+    if not data_model:
+        return 'unknown'
+    if data_model.isascii():
+        return data_model.translate(_DM_TABLE)
+    return data_model.lower().replace(' ', '_')
+
+
+@dataclass(slots=True, frozen=True)
 class FieldMapping:
     """Represents a single field mapping."""
     raw_field: str
@@ -16,6 +47,249 @@ class FieldMapping:
     field_flag: str
     requirement: str
     notes: str
+    transformation_lc: str = field(init=False, repr=False, compare=False)
+    field_flag_lc: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        """Lower-case the transformation and flag once for the generators' comparisons."""
+        object.__setattr__(self, 'transformation_lc', self.transformation.lower())
+        object.__setattr__(self, 'field_flag_lc', self.field_flag.lower())
+
+
+def _build_full_row(row: List[str]) -> FieldMapping:
+    """Build a mapping from a six-column table row; extra columns are ignored."""
+    return FieldMapping(row[0], row[1], row[2], row[3], row[4], row[5])
+
+
+def _build_short_row(row: List[str]) -> FieldMapping:
+    """Build a mapping from a five-column row, deriving the missing field flag from the transformation."""
+    field_flag = 'extracted' if row[2].lower() == 'alias' else 'calculated'
+    return FieldMapping(row[0], row[1], row[2], field_flag, row[3], row[4])
+
+
+# Table rows keyed by column count (capped at 6); rows with fewer columns are skipped
+_ROW_BUILDERS = {6: _build_full_row, 5: _build_short_row}
+
+
+@dataclass
+class _MappingGroups:
+    """Field mappings grouped in one pass by how the generators configure them."""
+    all: List[FieldMapping] = field(default_factory=list)
+    aliases: List[FieldMapping] = field(default_factory=list)
+    calculations: List[FieldMapping] = field(default_factory=list)
+    lookups: List[FieldMapping] = field(default_factory=list)
+    extracted_flags: List[FieldMapping] = field(default_factory=list)
+    calculated_flags: List[FieldMapping] = field(default_factory=list)
+    
+    @classmethod
+    def from_mappings(cls, mappings: List[FieldMapping]) -> "_MappingGroups":
+        """Sort each mapping into every group it belongs to."""
+        groups = cls(all=mappings)
+        for mapping in mappings:
+            transformation = mapping.transformation_lc
+            flag = mapping.field_flag_lc
+            if transformation == 'alias' or flag == 'extracted':
+                groups.aliases.append(mapping)
+            if transformation == 'eval' or flag == 'calculated':
+                groups.calculations.append(mapping)
+            if transformation == 'lookup':
+                groups.lookups.append(mapping)
+            if flag == 'extracted':
+                groups.extracted_flags.append(mapping)
+            elif flag == 'calculated':
+                groups.calculated_flags.append(mapping)
+        return groups
+
+
+@dataclass
+class _SharedValues:
+    """Strings derived from the data model and mappings that several generators reuse."""
+    dm_safe: str
+    cim_fields_top10: str
+    cim_fields_top15: str
+    first_field: str
+    calculated_fields: List[str]
+    extracted_fields: List[str]
+    calc_fields_top10: str
+    ext_fields_top10: str
+    
+    @classmethod
+    def from_groups(cls, groups: _MappingGroups, data_model: str) -> "_SharedValues":
+        """Compute each shared value once for a single generate_output call."""
+        mappings = groups.all
+        calculated_fields = [m.cim_field for m in groups.calculated_flags]
+        extracted_fields = [m.cim_field for m in groups.extracted_flags]
+        return cls(
+            dm_safe=_dm_safe(data_model),
+            cim_fields_top10=', '.join([m.cim_field for m in mappings[:10]]) if mappings else 'field1, field2',
+            cim_fields_top15=', '.join([m.cim_field for m in mappings[:15]]) if mappings else 'action, src, dest, user',
+            first_field=mappings[0].cim_field if mappings else 'action',
+            calculated_fields=calculated_fields,
+            extracted_fields=extracted_fields,
+            calc_fields_top10=', '.join(calculated_fields[:10]) if calculated_fields else 'action, src, dest',
+            ext_fields_top10=', '.join(extracted_fields[:10]) if extracted_fields else 'src_port, dest_port'
+        )
+
+
+# File written for each output by OutputGenerator.generate_to_dir
+_OUTPUT_FILENAMES = {
+    'gui_instructions': 'gui_instructions.md',
+    'props_conf': 'props.conf',
+    'transforms_conf': 'transforms.conf',
+    'eventtypes_conf': 'eventtypes.conf',
+    'tags_conf': 'tags.conf',
+    'validation_spl': 'validation_spl.md'
+}
+
+# Templates rendered with str.format_map; the looped sections are built separately
+_GUI_OVERVIEW_TMPL = """# Splunk Cloud GUI Configuration Instructions
+
+## Overview
+- **Data Model**: {data_model}
+- **Dataset**: {dataset}
+- **Sourcetype**: `{sourcetype}`
+- **Tags**: {tags_list}
+
+---
+
+## Step 1: Create Event Type
+
+1. Navigate to **Settings → Event Types**
+2. Click **New Event Type**
+3. Configure:
+   - **Name**: `{sourcetype}_{dm_safe}`
+   - **Search String**: `sourcetype={sourcetype}`
+   - **Tags**: {event_tags}
+4. Click **Save**
+
+---
+
+## Step 2: Configure Field Aliases (EXTRACTED fields)
+
+Navigate to **Settings → Fields → Field Aliases**
+
+"""
+
+_GUI_VALIDATE_TMPL = """---
+
+## Step 4: Validate Configuration
+
+Run the validation search in Splunk:
+
+```spl
+index=* sourcetype={sourcetype}
+| head 100
+| table _time, {cim_fields_str}
+```
+
+---
+
+## Step 5: Test Data Model Compliance
+
+```spl
+| datamodel {data_model} {dataset} search
+| search sourcetype={sourcetype}
+| head 100
+```
+
+---
+
+## Field Mapping Summary
+
+| CIM Field | Type | Raw Field | Configuration Method |
+|-----------|------|-----------|---------------------|
+"""
+
+_VALIDATION_SPL_TMPL = """# Validation SPL Queries for {sourcetype}
+
+## 1. Field Population Check
+```spl
+index=* sourcetype={sourcetype}
+| head 1000
+| table _time, {cim_fields}
+| stats count by {first_field}
+```
+
+## 2. Validate CALCULATED Fields
+```spl
+index=* sourcetype={sourcetype}
+| head 100
+| table _time, {calc_fields_str}
+| where isnotnull(action) OR isnotnull(src)
+```
+
+## 3. Validate EXTRACTED Fields
+```spl
+index=* sourcetype={sourcetype}
+| head 100
+| table _time, {ext_fields_str}
+```
+
+## 4. Data Model Validation
+```spl
+| datamodel {data_model} {dataset} search
+| search sourcetype={sourcetype}
+| head 100
+| table _time, {cim_fields}
+```
+
+## 5. Tag Verification
+```spl
+index=* sourcetype={sourcetype}
+| head 100
+| eval has_tags = if(tag!="", "yes", "no")
+| stats count by has_tags
+```
+
+## 6. CIM Compliance Check
+```spl
+| datamodel {data_model} {dataset} search
+| search sourcetype={sourcetype}
+| eval compliance_status = case(
+    isnull(action), "FAIL: action field missing",
+    isnull(src), "FAIL: src field missing",
+    isnull(dest), "FAIL: dest field missing",
+    1=1, "PASS"
+)
+| stats count by compliance_status
+```
+
+## Field Type Summary
+**Calculated Fields (EVAL required):** {calculated_list}
+**Extracted Fields (FIELDALIAS):** {extracted_list}
+"""
+
+
+class _LazyOutputs(Mapping):
+    """Read-only mapping of output names to text that generates each output on first access."""
+    
+    def __init__(self, builders: Dict[str, Callable[[], str]]):
+        """
+        Initialize the lazy outputs.
+        
+        Args:
+            builders: Output name to a zero-argument callable producing that output
+        """
+        self._builders = builders
+        self._values: Dict[str, str] = {}
+    
+    def __getitem__(self, key: str) -> str:
+        """Return the output, generating and memoizing it on first access."""
+        if key not in self._values:
+            self._values[key] = self._builders[key]()
+        return self._values[key]
+    
+    def __contains__(self, key) -> bool:
+        """Check membership without generating the output."""
+        return key in self._builders
+    
+    def __iter__(self) -> Iterator[str]:
+        """Iterate output names in generation order."""
+        return iter(self._builders)
+    
+    def __len__(self) -> int:
+        """Number of outputs available for the deployment mode."""
+        return len(self._builders)
 
 
 class OutputGenerator:
@@ -25,89 +299,163 @@ class OutputGenerator:
         """Initialize output generator."""
         self.deployment_mode = deployment_mode.lower()
     
-    def generate_output(self, mapping_result: Dict, sourcetype: str) -> Dict[str, str]:
-        """Generate output based on deployment mode."""
-        outputs = {}
-        
-        mappings = self._parse_mapping_result(mapping_result.get('mapping', ''))
+    def generate_output(self, mapping_result: Dict, sourcetype: str, cache: bool = True) -> Mapping[str, str]:
+        """Generate output based on deployment mode; pass cache=False to bypass the shared output cache."""
+        mapping_text = mapping_result.get('mapping', '')
         data_model = mapping_result.get('data_model', 'Unknown')
         dataset = mapping_result.get('dataset', 'Unknown')
-        tags = self._extract_tags(mapping_result.get('mapping', ''))
-        eval_expressions = self._extract_eval_expressions(mapping_result.get('mapping', ''))
+        
+        if not cache:
+            return self._build_outputs(mapping_text, sourcetype, data_model, dataset)
+        
+        # The lazy mapping is read-only, so callers can share the cached instance
+        return _generate_output_cached(
+            self.deployment_mode, mapping_text, sourcetype, data_model, dataset
+        )
+    
+    def generate_to_dir(self, out_dir: str, sourcetype: str, mapping_result: Dict) -> Dict[str, str]:
+        """Write each output for the deployment mode into out_dir and return the file paths by output name."""
+        sources = self._output_sources(
+            mapping_result.get('mapping', ''), sourcetype,
+            mapping_result.get('data_model', 'Unknown'), mapping_result.get('dataset', 'Unknown')
+        )
+        
+        os.makedirs(out_dir, exist_ok=True)
+        paths = {}
+        for name, source in sources.items():
+            path = os.path.join(out_dir, _OUTPUT_FILENAMES[name])
+            with open(path, 'w', encoding='utf-8', buffering=1 << 16) as f:
+                f.writelines(source())
+            paths[name] = path
+        
+        return paths
+    
+    def _build_outputs(self, mapping_text: str, sourcetype: str,
+                       data_model: str, dataset: str) -> Mapping[str, str]:
+        """Register the outputs for the deployment mode; each is generated when first read."""
+        sources = self._output_sources(mapping_text, sourcetype, data_model, dataset)
+        return _LazyOutputs({
+            name: (lambda source=source: "".join(source()))
+            for name, source in sources.items()
+        })
+    
+    def _output_sources(self, mapping_text: str, sourcetype: str,
+                        data_model: str, dataset: str) -> Dict[str, Callable[[], Iterable[str]]]:
+        """Map each output for the deployment mode to a callable yielding its text in pieces."""
+        sources = {}
+        
+        groups, tags, eval_expressions = self._parse_all(mapping_text)
+        shared = _SharedValues.from_groups(groups, data_model)
         
         if self.deployment_mode in ['cloud', 'both']:
-            outputs['gui_instructions'] = self._generate_gui_instructions(
-                mappings, sourcetype, data_model, dataset, tags, eval_expressions
-            )
+            sources['gui_instructions'] = lambda: (self._generate_gui_instructions(
+                groups, sourcetype, data_model, dataset, tags, eval_expressions, shared
+            ),)
         
         if self.deployment_mode in ['enterprise', 'both']:
-            outputs['props_conf'] = self._generate_props_conf(
-                mappings, sourcetype, data_model, dataset, eval_expressions
+            sources['props_conf'] = lambda: self._iter_props_conf_lines(
+                groups, sourcetype, data_model, dataset, eval_expressions
             )
-            outputs['transforms_conf'] = self._generate_transforms_conf(mappings, sourcetype)
-            outputs['eventtypes_conf'] = self._generate_eventtypes_conf(sourcetype, data_model)
-            outputs['tags_conf'] = self._generate_tags_conf(sourcetype, data_model, tags)
+            sources['transforms_conf'] = lambda: (self._generate_transforms_conf(groups, sourcetype),)
+            sources['eventtypes_conf'] = lambda: (self._generate_eventtypes_conf(sourcetype, shared.dm_safe),)
+            sources['tags_conf'] = lambda: self._iter_tags_conf_lines(sourcetype, shared.dm_safe, tags)
         
-        outputs['validation_spl'] = self._generate_validation_spl(
-            sourcetype, data_model, dataset, mappings
-        )
+        sources['validation_spl'] = lambda: (self._generate_validation_spl(
+            sourcetype, data_model, dataset, shared
+        ),)
         
-        return outputs
+        return sources
     
-    def _parse_mapping_result(self, mapping_text: str) -> List[FieldMapping]:
+    def _parse_all(self, mapping_text: str) -> Tuple[_MappingGroups, List[str], Dict[str, str]]:
+        """Parse the field mappings, required tags and EVAL expressions out of one mapping result."""
+        if not mapping_text:
+            return _MappingGroups(), [], {}
+        
+        # Locate the first occurrence of every section marker in one pass
+        offsets = {}
+        for match in _SECTIONS_RE.finditer(mapping_text):
+            offsets.setdefault(match.group(), match.start())
+            if len(offsets) == 3:
+                break
+        
+        return (
+            _MappingGroups.from_mappings(
+                self._parse_mapping_result(mapping_text, offsets.get('Raw Field', -1))
+            ),
+            self._extract_tags(mapping_text, offsets.get('## Required Tags:', -1)),
+            self._extract_eval_expressions(mapping_text, offsets.get('## Calculated Fields', -1))
+        )
+    
+    def _parse_mapping_result(self, mapping_text: str, header_idx: Optional[int] = None) -> List[FieldMapping]:
         """Parse the LLM mapping result into structured field mappings."""
         mappings = []
         
         if not mapping_text:
             return mappings
         
-        table_match = re.search(
-            r'\|\s*Raw Field\s*\|.*?\n\|[-\s|]+\n((?:\|.*?\n)+)',
-            mapping_text,
-            re.MULTILINE
-        )
-        
-        if table_match:
-            table_content = table_match.group(1)
-            for line in table_content.strip().split('\n'):
-                parts = [p.strip() for p in line.split('|')[1:-1]]
-                if len(parts) >= 5:
-                    if len(parts) >= 6:
-                        mappings.append(FieldMapping(
-                            raw_field=parts[0],
-                            cim_field=parts[1],
-                            transformation=parts[2],
-                            field_flag=parts[3],
-                            requirement=parts[4],
-                            notes=parts[5] if len(parts) > 5 else ""
-                        ))
-                    else:
-                        transformation = parts[2].lower()
-                        field_flag = 'extracted' if transformation == 'alias' else 'calculated'
-                        
-                        mappings.append(FieldMapping(
-                            raw_field=parts[0],
-                            cim_field=parts[1],
-                            transformation=parts[2],
-                            field_flag=field_flag,
-                            requirement=parts[3],
-                            notes=parts[4] if len(parts) > 4 else ""
-                        ))
+        rows = [[p.strip() for p in line.split('|')[1:-1]]
+                for line in self._find_table_lines(mapping_text, header_idx)]
+        for row in rows:
+            builder = _ROW_BUILDERS.get(min(len(row), 6))
+            if builder:
+                mappings.append(builder(row))
         
         return mappings
     
-    def _extract_tags(self, mapping_text: str) -> List[str]:
+    def _find_table_lines(self, mapping_text: str, header_idx: Optional[int] = None) -> List[str]:
+        """Return the data rows of the first '| Raw Field |' table, scanning line by line."""
+        if header_idx is None:
+            header_idx = mapping_text.find('Raw Field')
+        while header_idx >= 0:
+            line_start = mapping_text.rfind('\n', 0, header_idx) + 1
+            header_end = mapping_text.find('\n', header_idx)
+            if header_end < 0:
+                break
+            
+            pipe_idx = mapping_text.rfind('|', line_start, header_idx)
+            after_header = mapping_text[header_idx + len('Raw Field'):header_end]
+            if (pipe_idx >= 0 and not mapping_text[pipe_idx + 1:header_idx].strip()
+                    and after_header.lstrip().startswith('|')):
+                # The header must be followed by a |---|---| separator line
+                sep_start = header_end + 1
+                sep_end = mapping_text.find('\n', sep_start)
+                separator = mapping_text[sep_start + 1:sep_end]
+                if (sep_end > sep_start + 1 and mapping_text.startswith('|', sep_start)
+                        and not separator.strip(_SEPARATOR_CHARS)):
+                    # Blank or separator-only lines after the first separator are skipped too
+                    pos = sep_end + 1
+                    line_end = mapping_text.find('\n', pos)
+                    while line_end >= 0 and not mapping_text[pos:line_end].strip(_SEPARATOR_CHARS):
+                        pos = line_end + 1
+                        line_end = mapping_text.find('\n', pos)
+                    
+                    lines = []
+                    while mapping_text.startswith('|', pos):
+                        line_end = mapping_text.find('\n', pos)
+                        if line_end < 0:
+                            lines.append(mapping_text[pos:])
+                            break
+                        lines.append(mapping_text[pos:line_end])
+                        pos = line_end + 1
+                    if lines:
+                        return lines
+            
+            header_idx = mapping_text.find('Raw Field', header_idx + 1)
+        
+        return []
+    
+    def _extract_tags(self, mapping_text: str, start: Optional[int] = None) -> List[str]:
         """Extract required tags from mapping result."""
         tags = []
         
         if not mapping_text:
             return tags
         
-        tags_match = re.search(
-            r'## Required Tags:\s*\n((?:- .+\n?)+)',
-            mapping_text,
-            re.MULTILINE
-        )
+        if start is None:
+            start = mapping_text.find('## Required Tags:')
+        if start < 0:
+            return tags
+        tags_match = _TAGS_RE.search(mapping_text, start)
         
         if tags_match:
             tags_content = tags_match.group(1)
@@ -115,149 +463,109 @@ class OutputGenerator:
         
         return tags
     
-    def _extract_eval_expressions(self, mapping_text: str) -> Dict[str, str]:
+    def _extract_eval_expressions(self, mapping_text: str, start: Optional[int] = None) -> Dict[str, str]:
         """Extract EVAL expressions from the mapping result."""
         eval_expressions = {}
         
         if not mapping_text:
             return eval_expressions
         
-        calc_match = re.search(
-            r'## Calculated Fields.*?```\s*\n(.*?)```',
-            mapping_text,
-            re.MULTILINE | re.DOTALL
-        )
+        if start is None:
+            start = mapping_text.find('## Calculated Fields')
+        if start < 0:
+            return eval_expressions
+        calc_match = _CALC_BLOCK_RE.search(mapping_text, start)
         
         if calc_match:
             calc_content = calc_match.group(1)
             for line in calc_content.strip().split('\n'):
                 line = line.strip()
-                if line.startswith('EVAL-'):
-                    match = re.match(r'EVAL-(\w+)\s*=\s*(.+)', line)
-                    if match:
-                        eval_expressions[match.group(1)] = match.group(2)
+                if not line.startswith('EVAL-'):
+                    continue
+                name, sep, expr = line[5:].partition('=')
+                name = name.rstrip()
+                expr = expr.lstrip()
+                if sep and name and expr and f"_{name}".isidentifier():
+                    eval_expressions[name] = expr
         
         return eval_expressions
     
-    def _generate_gui_instructions(self, mappings: List[FieldMapping], sourcetype: str,
+    def _generate_gui_instructions(self, groups: _MappingGroups, sourcetype: str,
                                    data_model: str, dataset: str, tags: List[str],
-                                   eval_expressions: Dict[str, str]) -> str:
+                                   eval_expressions: Dict[str, str], shared: _SharedValues) -> str:
         """Generate step-by-step GUI instructions for Splunk Cloud."""
-        
-        dm_safe = data_model.lower().replace(' ', '_') if data_model else 'unknown'
-        
-        instructions = f"""# Splunk Cloud GUI Configuration Instructions
-
-## Overview
-- **Data Model**: {data_model}
-- **Dataset**: {dataset}
-- **Sourcetype**: `{sourcetype}`
-- **Tags**: {', '.join(tags) if tags else 'N/A'}
-
----
-
-## Step 1: Create Event Type
-
-1. Navigate to **Settings → Event Types**
-2. Click **New Event Type**
-3. Configure:
-   - **Name**: `{sourcetype}_{dm_safe}`
-   - **Search String**: `sourcetype={sourcetype}`
-   - **Tags**: {', '.join(tags) if tags else 'authentication'}
-4. Click **Save**
-
----
-
-## Step 2: Configure Field Aliases (EXTRACTED fields)
-
-Navigate to **Settings → Fields → Field Aliases**
-
-"""
-        alias_count = 1
-        for mapping in mappings:
-            if mapping.transformation.lower() == 'alias' or mapping.field_flag.lower() == 'extracted':
-                instructions += f"""### Field Alias {alias_count}: {mapping.cim_field}
+        parts = [_GUI_OVERVIEW_TMPL.format_map({
+            'data_model': data_model,
+            'dataset': dataset,
+            'sourcetype': sourcetype,
+            'dm_safe': shared.dm_safe,
+            'tags_list': ', '.join(tags) if tags else 'N/A',
+            'event_tags': ', '.join(tags) if tags else 'authentication'
+        })]
+        for alias_count, mapping in enumerate(groups.aliases, start=1):
+            cim_field = mapping.cim_field
+            raw_field = mapping.raw_field
+            parts.append(f"""### Field Alias {alias_count}: {cim_field}
 1. Click **New Field Alias**
 2. Configure:
-   - **Name**: `{sourcetype}_{mapping.cim_field}_alias`
+   - **Name**: `{sourcetype}_{cim_field}_alias`
    - **Apply to**: `sourcetype` = `{sourcetype}`
-   - **Field Alias**: `{mapping.raw_field} AS {mapping.cim_field}`
+   - **Field Alias**: `{raw_field} AS {cim_field}`
 3. Click **Save**
 
-"""
-                alias_count += 1
+""")
         
-        if alias_count == 1:
-            instructions += "_No field aliases needed for this log source._\n\n"
+        if not groups.aliases:
+            parts.append("_No field aliases needed for this log source._\n\n")
         
-        instructions += """---
+        parts.append("""---
 
 ## Step 3: Configure Calculated Fields (CALCULATED fields)
 
 Navigate to **Settings → Fields → Calculated Fields**
 
-"""
-        calc_count = 1
-        for mapping in mappings:
-            if mapping.transformation.lower() == 'eval' or mapping.field_flag.lower() == 'calculated':
-                eval_expr = eval_expressions.get(mapping.cim_field, f"coalesce({mapping.raw_field}, null)")
-                instructions += f"""### Calculated Field {calc_count}: {mapping.cim_field}
+""")
+        for calc_count, mapping in enumerate(groups.calculations, start=1):
+            cim_field = mapping.cim_field
+            eval_expr = eval_expressions.get(cim_field)
+            if eval_expr is None:
+                eval_expr = f"coalesce({mapping.raw_field}, null)"
+            parts.append(f"""### Calculated Field {calc_count}: {cim_field}
 1. Click **New Calculated Field**
 2. Configure:
-   - **Name**: `{sourcetype}_{mapping.cim_field}_calc`
+   - **Name**: `{sourcetype}_{cim_field}_calc`
    - **Apply to**: `sourcetype` = `{sourcetype}`
    - **Eval Expression**: `{eval_expr}`
 3. Click **Save**
 
-"""
-                calc_count += 1
-        
-        if calc_count == 1:
-            instructions += "_No calculated fields needed for this log source._\n\n"
+""")
         
-        cim_fields_str = ', '.join([m.cim_field for m in mappings[:10]]) if mappings else 'field1, field2'
+        if not groups.calculations:
+            parts.append("_No calculated fields needed for this log source._\n\n")
         
-        instructions += f"""---
-
-## Step 4: Validate Configuration
-
-Run the validation search in Splunk:
-
-```spl
-index=* sourcetype={sourcetype}
-| head 100
-| table _time, {cim_fields_str}
-```
-
----
-
-## Step 5: Test Data Model Compliance
-
-```spl
-| datamodel {data_model} {dataset} search
-| search sourcetype={sourcetype}
-| head 100
-```
-
----
-
-## Field Mapping Summary
-
-| CIM Field | Type | Raw Field | Configuration Method |
-|-----------|------|-----------|---------------------|
-"""
-        for mapping in mappings:
-            config_method = "Field Alias" if mapping.field_flag.lower() == 'extracted' else "Calculated Field (EVAL)"
-            instructions += f"| {mapping.cim_field} | {mapping.field_flag} | {mapping.raw_field} | {config_method} |\n"
+        parts.append(_GUI_VALIDATE_TMPL.format_map({
+            'sourcetype': sourcetype,
+            'cim_fields_str': shared.cim_fields_top10,
+            'data_model': data_model,
+            'dataset': dataset
+        }))
+        for mapping in groups.all:
+            config_method = "Field Alias" if mapping.field_flag_lc == 'extracted' else "Calculated Field (EVAL)"
+            parts.append(f"| {mapping.cim_field} | {mapping.field_flag} | {mapping.raw_field} | {config_method} |\n")
         
-        return instructions
+        return "".join(parts)
     
-    def _generate_props_conf(self, mappings: List[FieldMapping], sourcetype: str,
+    def _generate_props_conf(self, groups: _MappingGroups, sourcetype: str,
                             data_model: str, dataset: str,
                             eval_expressions: Dict[str, str]) -> str:
         """Generate props.conf configuration."""
-        
-        config = f"""# props.conf configuration for {sourcetype}
+        return "".join(self._iter_props_conf_lines(groups, sourcetype, data_model, dataset, eval_expressions))
+    
+    def _iter_props_conf_lines(self, groups: _MappingGroups, sourcetype: str,
+                               data_model: str, dataset: str,
+                               eval_expressions: Dict[str, str]) -> Iterator[str]:
+        """Yield props.conf in pieces: the header, then one line per alias and EVAL."""
+        yield f"""# props.conf configuration for {sourcetype}
 # Data Model: {data_model} > {dataset}
 
 [{sourcetype}]
@@ -266,37 +574,31 @@ index=* sourcetype={sourcetype}
 # FIELD ALIASES (extracted fields)
 # ============================================
 """
-        has_aliases = False
-        for mapping in mappings:
-            if mapping.field_flag.lower() == 'extracted' or mapping.transformation.lower() == 'alias':
-                config += f"FIELDALIAS-{mapping.cim_field} = {mapping.raw_field} AS {mapping.cim_field}\n"
-                has_aliases = True
+        for mapping in groups.aliases:
+            cim_field = mapping.cim_field
+            yield f"FIELDALIAS-{cim_field} = {mapping.raw_field} AS {cim_field}\n"
         
-        if not has_aliases:
-            config += "# No field aliases needed\n"
+        if not groups.aliases:
+            yield "# No field aliases needed\n"
         
-        config += """
+        yield """
 # ============================================
 # CALCULATED FIELDS (calculated fields)
 # ============================================
 """
-        has_calcs = False
-        for mapping in mappings:
-            if mapping.field_flag.lower() == 'calculated' or mapping.transformation.lower() == 'eval':
-                eval_expr = eval_expressions.get(mapping.cim_field, f"coalesce({mapping.raw_field}, null)")
-                config += f"EVAL-{mapping.cim_field} = {eval_expr}\n"
-                has_calcs = True
-        
-        if not has_calcs:
-            config += "# No calculated fields needed\n"
-        
-        return config
+        for mapping in groups.calculations:
+            cim_field = mapping.cim_field
+            eval_expr = eval_expressions.get(cim_field)
+            if eval_expr is None:
+                eval_expr = f"coalesce({mapping.raw_field}, null)"
+            yield f"EVAL-{cim_field} = {eval_expr}\n"
+        
+        if not groups.calculations:
+            yield "# No calculated fields needed\n"
     
-    def _generate_transforms_conf(self, mappings: List[FieldMapping], sourcetype: str) -> str:
+    def _generate_transforms_conf(self, groups: _MappingGroups, sourcetype: str) -> str:
         """Generate transforms.conf if needed."""
-        lookup_mappings = [m for m in mappings if m.transformation.lower() == 'lookup']
-        
-        if not lookup_mappings:
+        if not groups.lookups:
             return "# No transforms.conf needed - no lookup transformations required"
         
         config = f"""# transforms.conf for {sourcetype}
@@ -306,98 +608,48 @@ filename = {sourcetype}_lookup.csv
 """
         return config
     
-    def _generate_eventtypes_conf(self, sourcetype: str, data_model: str) -> str:
+    def _generate_eventtypes_conf(self, sourcetype: str, dm_safe: str) -> str:
         """Generate eventtypes.conf configuration."""
-        dm_safe = data_model.lower().replace(' ', '_') if data_model else 'unknown'
         return f"""# eventtypes.conf for {sourcetype}
 
 [{sourcetype}_{dm_safe}]
 search = sourcetype={sourcetype}
 """
     
-    def _generate_tags_conf(self, sourcetype: str, data_model: str, tags: List[str]) -> str:
+    def _generate_tags_conf(self, sourcetype: str, dm_safe: str, tags: List[str]) -> str:
         """Generate tags.conf configuration."""
-        dm_safe = data_model.lower().replace(' ', '_') if data_model else 'unknown'
-        config = f"""# tags.conf for {sourcetype}
+        return "".join(self._iter_tags_conf_lines(sourcetype, dm_safe, tags))
+    
+    def _iter_tags_conf_lines(self, sourcetype: str, dm_safe: str, tags: List[str]) -> Iterator[str]:
+        """Yield tags.conf in pieces: the stanza header, then one line per tag."""
+        yield f"""# tags.conf for {sourcetype}
 
 [eventtype={sourcetype}_{dm_safe}]
 """
-        if tags:
-            for tag in tags:
-                config += f"{tag} = enabled\n"
-        else:
-            config += "# Add appropriate tags here\n"
+        for tag in tags:
+            yield f"{tag} = enabled\n"
         
-        return config
+        if not tags:
+            yield "# Add appropriate tags here\n"
     
     def _generate_validation_spl(self, sourcetype: str, data_model: str,
-                                dataset: str, mappings: List[FieldMapping]) -> str:
+                                dataset: str, shared: _SharedValues) -> str:
         """Generate validation SPL queries."""
-        
-        cim_fields = ', '.join([m.cim_field for m in mappings[:15]]) if mappings else 'action, src, dest, user'
-        first_field = mappings[0].cim_field if mappings else 'action'
-        
-        calculated_fields = [m.cim_field for m in mappings if m.field_flag.lower() == 'calculated']
-        extracted_fields = [m.cim_field for m in mappings if m.field_flag.lower() == 'extracted']
-        
-        calc_fields_str = ', '.join(calculated_fields[:10]) if calculated_fields else 'action, src, dest'
-        ext_fields_str = ', '.join(extracted_fields[:10]) if extracted_fields else 'src_port, dest_port'
-        
-        return f"""# Validation SPL Queries for {sourcetype}
-
-## 1. Field Population Check
-```spl
-index=* sourcetype={sourcetype}
-| head 1000
-| table _time, {cim_fields}
-| stats count by {first_field}
-```
-
-## 2. Validate CALCULATED Fields
-```spl
-index=* sourcetype={sourcetype}
-| head 100
-| table _time, {calc_fields_str}
-| where isnotnull(action) OR isnotnull(src)
-```
-
-## 3. Validate EXTRACTED Fields
-```spl
-index=* sourcetype={sourcetype}
-| head 100
-| table _time, {ext_fields_str}
-```
-
-## 4. Data Model Validation
-```spl
-| datamodel {data_model} {dataset} search
-| search sourcetype={sourcetype}
-| head 100
-| table _time, {cim_fields}
-```
-
-## 5. Tag Verification
-```spl
-index=* sourcetype={sourcetype}
-| head 100
-| eval has_tags = if(tag!="", "yes", "no")
-| stats count by has_tags
-```
-
-## 6. CIM Compliance Check
-```spl
-| datamodel {data_model} {dataset} search
-| search sourcetype={sourcetype}
-| eval compliance_status = case(
-    isnull(action), "FAIL: action field missing",
-    isnull(src), "FAIL: src field missing",
-    isnull(dest), "FAIL: dest field missing",
-    1=1, "PASS"
-)
-| stats count by compliance_status
-```
-
-## Field Type Summary
-**Calculated Fields (EVAL required):** {', '.join(calculated_fields) if calculated_fields else 'None detected'}
-**Extracted Fields (FIELDALIAS):** {', '.join(extracted_fields) if extracted_fields else 'None detected'}
-"""
+        return _VALIDATION_SPL_TMPL.format_map({
+            'sourcetype': sourcetype,
+            'data_model': data_model,
+            'dataset': dataset,
+            'cim_fields': shared.cim_fields_top15,
+            'first_field': shared.first_field,
+            'calc_fields_str': shared.calc_fields_top10,
+            'ext_fields_str': shared.ext_fields_top10,
+            'calculated_list': ', '.join(shared.calculated_fields) if shared.calculated_fields else 'None detected',
+            'extracted_list': ', '.join(shared.extracted_fields) if shared.extracted_fields else 'None detected'
+        })
+
+
+@lru_cache(maxsize=256)
+def _generate_output_cached(deployment_mode: str, mapping_text: str, sourcetype: str,
+                            data_model: str, dataset: str) -> Mapping[str, str]:
+    """Build outputs once per distinct mode, mapping text, sourcetype and data model."""
+    return OutputGenerator(deployment_mode)._build_outputs(mapping_text, sourcetype, data_model, dataset)
@@ -0,0 +1,71 @@
+"""
+Query Cache for CIM Mapping Results
+Thread-safe LRU + TTL cache so repeated analyses skip the vector search and LLM call
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class QueryCache:
+    """Bounded LRU cache with per-entry time-to-live."""
+
+    def __init__(self, max_size: int = 512, ttl_seconds: float = 600):
+        """
+        Initialize the query cache.
+
+        Args:
+            max_size: Maximum number of entries kept before evicting the least recently used
+            ttl_seconds: Seconds an entry stays valid after it was stored
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached result for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            expiry_ts, result = entry
+            if expiry_ts < time.monotonic():
+                del self._entries[key]
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return result
+
+    def set(self, key: Hashable, result: Any):
+        """Store a result, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Get hit/miss statistics for the cache."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0
+            }
@@ -3,12 +3,15 @@ Vector Store for CIM Knowledge Base
 Uses ChromaDB for semantic search of CIM field definitions
 """
 import json
+import hashlib
+import time
 from pathlib import Path
 from typing import List, Dict, Optional
 
 # Try to import ChromaDB and sentence-transformers
 try:
     import chromadb
+    import numpy as np
     from chromadb.config import Settings
     CHROMADB_AVAILABLE = True
 except ImportError:
@@ -24,13 +27,17 @@ except ImportError:
 class CIMVectorStore:
     """Vector store for CIM knowledge base with semantic search capabilities."""
     
-    def __init__(self, knowledge_dir: str = "data/cim_knowledge", db_dir: str = "data/vector_db"):
+    def __init__(self, knowledge_dir: str = "data/cim_knowledge", db_dir: str = "data/vector_db",
+                 max_cache_entries: int = 512):
         """Initialize the CIM vector store."""
         self.knowledge_dir = Path(knowledge_dir)
         self.db_dir = Path(db_dir)
+        self.max_cache_entries = max_cache_entries
         self.db_dir.mkdir(parents=True, exist_ok=True)
         
         self.available = CHROMADB_AVAILABLE and SENTENCE_TRANSFORMERS_AVAILABLE
+        # Bumped whenever CIM knowledge is (re)loaded so dependent caches can invalidate
+        self.last_upsert_ts = 0.0
         
         if self.available:
             # Initialize embedding model
@@ -48,6 +55,12 @@ class CIMVectorStore:
                 metadata={"description": "Splunk CIM field definitions and mappings"}
             )
             
+            # Previously generated mappings, searched by cosine similarity
+            self.cache_collection = self.client.get_or_create_collection(
+                name="cim_mapping_cache",
+                metadata={"description": "Cached CIM mapping results", "hnsw:space": "cosine"}
+            )
+            
             # Load CIM knowledge if collection is empty
             if self.collection.count() == 0:
                 self.load_cim_knowledge()
@@ -55,6 +68,7 @@ class CIMVectorStore:
             self.embedding_model = None
             self.client = None
             self.collection = None
+            self.cache_collection = None
     
     def load_cim_knowledge(self):
         """Load all CIM data model definitions into the vector store."""
@@ -144,6 +158,8 @@ Tags: {', '.join(tags)}
                 ids=ids
             )
             
+            self.last_upsert_ts = time.time()
+            
             print(f"\n✓ Loaded {len(documents)} CIM field definitions into vector store")
     
     def search_similar_fields(self, query: str, n_results: int = 10, 
@@ -175,6 +191,145 @@ Tags: {', '.join(tags)}
         
         return formatted_results
     
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        """Encode texts into a float32 embedding matrix, one row per text."""
+        return np.asarray(self.embedding_model.encode(texts), dtype=np.float32)
+    
+    def batch_search_similar_fields(self, queries: List[str], n_results: int = 5,
+                                    data_model_filter: Optional[str] = None) -> List[List[Dict]]:
+        """Search for CIM fields similar to each query using one embedding pass and one query call."""
+        if not self.available or not queries:
+            return [[] for _ in queries]
+        
+        return self.batch_search_similar_fields_by_embedding(
+            self.embed(queries), n_results, data_model_filter
+        )
+    
+    def batch_search_similar_fields_by_embedding(self, query_embeddings: "np.ndarray", n_results: int = 5,
+                                                 data_model_filter: Optional[str] = None) -> List[List[Dict]]:
+        """Search for CIM fields similar to each precomputed query embedding in one query call."""
+        if not self.available or len(query_embeddings) == 0:
+            return [[] for _ in range(len(query_embeddings))]
+        
+        where_filter = None
+        if data_model_filter:
+            where_filter = {"data_model": data_model_filter}
+        
+        results = self.collection.query(
+            query_embeddings=np.asarray(query_embeddings).tolist(),
+            n_results=n_results,
+            where=where_filter
+        )
+        
+        formatted_results = []
+        for q in range(len(query_embeddings)):
+            query_results = []
+            if results and results['documents']:
+                for i in range(len(results['documents'][q])):
+                    query_results.append({
+                        "document": results['documents'][q][i],
+                        "metadata": results['metadatas'][q][i],
+                        "distance": results['distances'][q][i] if 'distances' in results else None
+                    })
+            formatted_results.append(query_results)
+        
+        return formatted_results
+    
+    def search_similar_fields_ranked(self, queries: List[str], n_results: int = 5,
+                                     limit: int = 20) -> List[Dict]:
+        """Batch search all queries and merge the hits closest-first, keeping each CIM field once."""
+        hits = [r for query_results in self.batch_search_similar_fields(queries, n_results)
+                for r in query_results]
+        if not hits:
+            return []
+        
+        distances = np.array(
+            [r['distance'] if r['distance'] is not None else np.inf for r in hits],
+            dtype=np.float32
+        )
+        order = np.argsort(distances, kind='stable')
+        
+        merged = []
+        seen_fields = set()
+        for i in order:
+            metadata = hits[i]['metadata']
+            field_key = (metadata.get('data_model', ''), metadata.get('dataset', ''), metadata.get('field_name', ''))
+            if field_key not in seen_fields:
+                seen_fields.add(field_key)
+                merged.append(hits[i])
+                if len(merged) == limit:
+                    break
+        
+        return merged
+    
+    def search_cache(self, query_embedding: "np.ndarray", threshold: float = 0.92) -> Optional[Dict]:
+        """Return the closest cached mapping if its cosine similarity reaches the threshold."""
+        if not self.available or self.cache_collection.count() == 0:
+            return None
+        
+        results = self.cache_collection.query(
+            query_embeddings=[np.asarray(query_embedding).tolist()],
+            n_results=1
+        )
+        
+        if not results or not results['documents'] or not results['documents'][0]:
+            return None
+        
+        similarity = 1.0 - results['distances'][0][0]
+        if similarity < threshold:
+            return None
+        
+        metadata = results['metadatas'][0][0]
+        return {
+            "result_text": results['documents'][0][0],
+            "query": metadata.get('query', ''),
+            "data_model": metadata.get('data_model', ''),
+            "dataset": metadata.get('dataset', ''),
+            "similarity": similarity
+        }
+    
+    def add_to_cache(self, query: str, query_embedding: "np.ndarray", result_text: str,
+                     data_model: Optional[str] = None, dataset: Optional[str] = None):
+        """Store a generated mapping under the embedding used to look it up."""
+        if not self.available:
+            return
+        
+        doc_id = hashlib.blake2b(query.encode('utf-8'), digest_size=16).hexdigest()
+        
+        self.cache_collection.upsert(
+            documents=[result_text],
+            embeddings=[np.asarray(query_embedding).tolist()],
+            metadatas=[{
+                "query": query,
+                "data_model": data_model or "",
+                "dataset": dataset or "",
+                "stored_ts": time.time()
+            }],
+            ids=[doc_id]
+        )
+        
+        overflow = self.cache_collection.count() - self.max_cache_entries
+        if overflow > 0:
+            self._evict_cache_entries(overflow)
+    
+    def _evict_cache_entries(self, count: int):
+        """Delete the `count` oldest entries from the mapping cache."""
+        entries = self.cache_collection.get(include=["metadatas"])
+        stored = sorted(
+            zip(entries['ids'], entries['metadatas']),
+            key=lambda entry: (entry[1] or {}).get('stored_ts', 0.0)
+        )
+        self.cache_collection.delete(ids=[doc_id for doc_id, _ in stored[:count]])
+    
+    def clear_cache_collection(self):
+        """Delete every stored mapping from the persistent mapping cache."""
+        if not self.available:
+            return
+        
+        doc_ids = self.cache_collection.get(include=[])['ids']
+        if doc_ids:
+            self.cache_collection.delete(ids=doc_ids)
+    
     def get_all_data_models(self) -> List[str]:
         """Get list of all available data models."""
         if not self.available: